@@ -1,10 +1,33 @@
 import random
 
+SUITS = ['S', 'H', 'D', 'C']
+RANKS = [2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14]
+LIMITED_RANKS = [9, 10, 11, 12, 13, 14]
+NUM_CARDS = len(SUITS) * len(RANKS)
+
+
+def card_id(suit: str, rank: int) -> int:
+    # NOTE: Cards are encoded as integers 0..51, suit major and rank minor.
+    # This matches the order in which CardDeck lays out a full deck.
+    return SUITS.index(suit) * len(RANKS) + (rank - RANKS[0])
+
+
 class Card:
+    # NOTE: Cards are immutable and interned. Card(suit, rank) always returns
+    # the same object from the 52 card table, so cards can be compared by 
+    # identity, hashed and converted to their integer id with int(card).
+    __slots__ = ("suit", "rank", "id")
+    
+    def __new__(cls, suit, rank):
+        return CARDS[card_id(suit, rank)]
     
-    def __init__(self, suit, rank):
-        self.suit = suit
-        self.rank = rank
+    @classmethod
+    def _create(cls, suit: str, rank: int) -> "Card":
+        card = object.__new__(cls)
+        object.__setattr__(card, "suit", suit)
+        object.__setattr__(card, "rank", rank)
+        object.__setattr__(card, "id", card_id(suit, rank))
+        return card
         
     def __str__(self):
         rank_symbols = {"10":"T", "11":"J", "12":"Q", "13":"K", "14":"A"}
@@ -13,37 +36,184 @@ class Card:
             rank = rank_symbols[rank]
         return rank + self.suit
     
+    def __repr__(self):
+        return self.__str__()
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("Card is immutable")
+    
+    def __eq__(self, other):
+        if isinstance(other, Card):
+            return self.id == other.id
+        return NotImplemented
+    
+    def __hash__(self):
+        return self.id
+    
+    def __int__(self):
+        return self.id
+    
+    def __index__(self):
+        return self.id
+    
+    # NOTE: Copying or pickling a card must give back the interned instance
+    def __reduce__(self):
+        return get_card, (self.id,)
+    
+    def __copy__(self):
+        return self
+    
+    def __deepcopy__(self, memo):
+        return self
+    
     def get_suit(self):
         return self.suit
     
     def get_rank(self):
         return self.rank
     
+
+CARDS: tuple[Card] = tuple(Card._create(suit, rank) for suit in SUITS for rank in RANKS)
+CARD_SUITS: tuple[str] = tuple(card.suit for card in CARDS)
+CARD_RANKS: tuple[int] = tuple(card.rank for card in CARDS)
+
+
+def get_card(card: int) -> Card:
+    return CARDS[card]
+
+
+def get_card_ids(cards: list[Card | int]) -> list[int]:
+    # NOTE: Accepts both Card objects and integer ids
+    return [int(card) for card in cards]
+    
     
+FULL_DECK_IDS: tuple[int] = tuple(card.id for card in CARDS)
+LIMITED_DECK_IDS: tuple[int] = tuple(card.id for card in CARDS if card.rank in LIMITED_RANKS)
+
+
+def get_card_mask(cards: list[Card | int]) -> int:
+    mask = 0
+    for card in cards:
+        mask |= 1 << int(card)
+    return mask
+
+
 class CardDeck:
-    
+        # NOTE: The deck never moves Card objects around. It keeps a buffer of card ids split into three regions:
+        #   [0, num_live)              cards that can still be dealt
+        #   [num_live, num_stocked)    cards that have been dealt
+        #   [num_stocked, len(deck))   cards that have been excluded
+        # A 64-bit mask marks every card that is dealt or excluded. Excluding a card swaps it to the back 
+        # of the buffer, and dealing from a shuffled deck is a partial Fisher-Yates shuffle of the live region.
+        # restock() puts the dealt cards back in O(1), so one deck can be reused across many rollouts.
         def __init__(self, limited = False):
-            self.suits = ['S', 'H', 'D', 'C']
-            self.ranks = [2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14] if not limited else [9, 10, 11, 12, 13, 14]
-            self.cards: list[Card] = []
-            for suit in self.suits:
-                for rank in self.ranks:
-                    self.cards.append(Card(suit, rank))
+            self.suits = SUITS
+            self.ranks = RANKS if not limited else LIMITED_RANKS
+            self.limited = limited
+            self.deck_ids: tuple[int] = LIMITED_DECK_IDS if limited else FULL_DECK_IDS
+            self.card_ids: list[int] = list(self.deck_ids)
+            self.positions: list[int] = list(_LIMITED_DECK_POSITIONS if limited else _FULL_DECK_POSITIONS)
+            self.num_live = len(self.card_ids)
+            self.num_stocked = len(self.card_ids)
+            self.used_mask = 0
+            self.excluded_mask = 0
+            self.is_shuffled = False
                     
         def __str__(self):
             return ' '.join(str(card) for card in self.cards)
         
+        def __len__(self):
+            return self.num_live
+        
+        def __deepcopy__(self, memo):
+            return self.copy()
+        
+        @property
+        def cards(self) -> list[Card]:
+            # NOTE: Snapshot of the cards that can still be dealt
+            return [CARDS[card] for card in self.card_ids[:self.num_live]]
+        
+        def copy(self) -> "CardDeck":
+            card_deck = CardDeck.__new__(CardDeck)
+            card_deck.suits = self.suits
+            card_deck.ranks = self.ranks
+            card_deck.limited = self.limited
+            card_deck.deck_ids = self.deck_ids
+            card_deck.card_ids = self.card_ids[:]
+            card_deck.positions = self.positions[:]
+            card_deck.num_live = self.num_live
+            card_deck.num_stocked = self.num_stocked
+            card_deck.used_mask = self.used_mask
+            card_deck.excluded_mask = self.excluded_mask
+            card_deck.is_shuffled = self.is_shuffled
+            return card_deck
+        
         def shuffle(self):
-            random.shuffle(self.cards)
+            # NOTE: Shuffling is lazy. A shuffled deck draws uniformly at random among the live cards when dealing.
+            self.is_shuffled = True
             
-        def deal(self, n):
-            return [self.cards.pop() for _ in range(n)]
-        
-        def exclude(self, cards: list[Card]):
-            for exclude_card in cards:
-                self.cards = [deck_card for deck_card in self.cards 
-                              if not (deck_card.get_rank() == exclude_card.get_rank()
-                                      and deck_card.get_suit() == exclude_card.get_suit())]
+        def deal(self, n) -> list[Card]:
+            return [CARDS[card] for card in self.deal_ids(n)]
+        
+        def deal_ids(self, n: int, out: list[int] | None = None, offset: int = 0) -> list[int]:
+            # NOTE: Writes the dealt ids into out[offset:offset+n] when a buffer is given.
+            if n > self.num_live:
+                raise IndexError("deal from deck with too few cards")
+            if out is None:
+                out = [0] * n
+                offset = 0
+            card_ids = self.card_ids
+            positions = self.positions
+            for i in range(n):
+                last = self.num_live - 1
+                if self.is_shuffled:
+                    j = random.randint(0, last)
+                    card = card_ids[j]
+                    card_ids[j] = card_ids[last]
+                    positions[card_ids[j]] = j
+                    card_ids[last] = card
+                    positions[card] = last
+                else:
+                    card = card_ids[last]
+                self.num_live = last
+                self.used_mask |= 1 << card
+                out[offset + i] = card
+            return out
+        
+        def restock(self):
+            # NOTE: Returns all dealt cards to the deck. Excluded cards stay out.
+            self.num_live = self.num_stocked
+            self.used_mask = self.excluded_mask
+        
+        def exclude(self, cards: list[Card | int]):
+            self.exclude_mask(get_card_mask(cards))
+            
+        def exclude_mask(self, mask: int):
+            mask &= ~self.excluded_mask
+            card_ids = self.card_ids
+            positions = self.positions
+            while mask:
+                low_bit = mask & -mask
+                mask ^= low_bit
+                card = low_bit.bit_length() - 1
+                position = positions[card]
+                if position < 0:
+                    # NOTE: Card is not part of this deck, e.g. a low card for the limited deck
+                    continue
+                if position < self.num_live:
+                    self.num_live -= 1
+                    self._swap(position, self.num_live)
+                    position = self.num_live
+                self.num_stocked -= 1
+                self._swap(position, self.num_stocked)
+                self.excluded_mask |= low_bit
+                self.used_mask |= low_bit
+                
+        def _swap(self, i: int, j: int):
+            card_ids = self.card_ids
+            card_ids[i], card_ids[j] = card_ids[j], card_ids[i]
+            self.positions[card_ids[i]] = i
+            self.positions[card_ids[j]] = j
                 
         def get_suits(self):
             return self.suits
@@ -52,6 +222,15 @@ class CardDeck:
             return self.ranks
         
         
+def _get_deck_positions(deck_ids: tuple[int]) -> tuple[int]:
+    positions = [-1] * NUM_CARDS
+    for position, card in enumerate(deck_ids):
+        positions[card] = position
+    return tuple(positions)
+        
+        
+_FULL_DECK_POSITIONS = _get_deck_positions(FULL_DECK_IDS)
+_LIMITED_DECK_POSITIONS = _get_deck_positions(LIMITED_DECK_IDS)
         
         
 if __name__ == "__main__":
@@ -4,7 +4,6 @@ from resolver import Resolver
 from state_manager import PokerStateManager
 from neural_networks import NeuralNetwork
 import numpy as np
-import copy
 
 # MARK: Poker agents
 
@@ -52,6 +51,11 @@ class RolloutPokerAgent(PokerAgent):
     
     # Implementing get action for a pure rollout based agent
     def get_action(self, public_cards: list[Card], num_opponents: int, rollout_count: int, poker_oracle: PokerOracle) -> str:
+        # NOTE: Scale probabilities based on number of players
+        num_players = num_opponents + 1
+        # NOTE: Rollouts stop early once the probability is clearly above or below both thresholds, 
+        # so rollout_count is only used up for close decisions
+        thresholds = (1 / num_players, 1 / (4 * num_players))
         if public_cards == []:
             try:
                 # NOTE: Use cheat sheet if it exists for pre-flop stage
@@ -60,16 +64,13 @@ class RolloutPokerAgent(PokerAgent):
                 cheat_sheet = poker_oracle.load_cheat_sheet(OPPONENTS, ROLLOUTS)
                 win_probability = poker_oracle.get_cheat_sheet_hole_pair_probabilitiy(self.hole_cards, num_opponents, cheat_sheet)
             except:
-                 win_probability = poker_oracle.rollout_hole_pair_evaluator(self.hole_cards, public_cards, num_opponents, rollout_count)
+                 win_probability, _ = poker_oracle.adaptive_hole_pair_evaluator(self.hole_cards, public_cards, num_opponents, rollout_count, thresholds)
         else:
-            win_probability = poker_oracle.rollout_hole_pair_evaluator(self.hole_cards, public_cards, num_opponents, rollout_count) 
+            win_probability, _ = poker_oracle.adaptive_hole_pair_evaluator(self.hole_cards, public_cards, num_opponents, rollout_count, thresholds) 
         
         print(f"Player {self.name}'s hole pair:", *self.hole_cards)
         print("Probability:", win_probability)
         
-        # NOTE: Scale probabilities based on number of players
-        num_players = num_opponents + 1
-        
         if win_probability >= 1 / num_players:
             action = "raise"
         elif win_probability >= 1 / (4 * num_players):
@@ -86,22 +87,17 @@ class ResolverPokerAgent(PokerAgent):
         super().__init__(type, initial_chips, name)
     
     def get_action(self, public_cards: list[Card], poker_oracle: PokerOracle, state_manager: PokerStateManager, resolver: Resolver, game_snapshot: dict) -> str:
-        strategy = resolver.get_initial_strategy()
-        acting_player_copy = copy.deepcopy(game_snapshot["acting_player"])
-        players_copy = copy.deepcopy(game_snapshot["round_players"])
-        pot_copy = copy.deepcopy(game_snapshot["pot"])
-        num_raises_copy = copy.deepcopy(game_snapshot["num_raises_left"])
+        # NOTE: The root state only reads the public bets and stacks of the players, so the snapshot can be passed directly
         root_state = state_manager.generate_root_state(
-                                            acting_player=acting_player_copy,
-                                            players=players_copy,
+                                            acting_player=game_snapshot["acting_player"],
+                                            players=game_snapshot["round_players"],
                                             public_cards=public_cards, 
-                                            pot=pot_copy, 
-                                            num_raises_left=num_raises_copy, 
+                                            pot=game_snapshot["pot"], 
+                                            num_raises_left=game_snapshot["num_raises_left"], 
                                             bet_to_call=game_snapshot["table_bet"],
                                             stage=game_snapshot["stage"],
                                             initial_round_action_history=game_snapshot["round_history"],
-                                            initial_depth=game_snapshot["depth"],
-                                            strategy_matrix=strategy
+                                            initial_depth=game_snapshot["depth"]
                                             )
             
         acting_player_range, other_player_range = resolver.get_initial_ranges(public_cards, self.hole_cards)
@@ -109,9 +105,7 @@ class ResolverPokerAgent(PokerAgent):
         end_depth = 1 
         num_rollouts = 1 if game_snapshot["stage"] == "river" else 10
         strategy = resolver.resolve(root_state, acting_player_range, other_player_range, end_stage, end_depth, num_rollouts)
-        hole_pair_key = poker_oracle.get_hole_pair_key(self.hole_cards)
-        all_hole_pair_keys = poker_oracle.get_all_hole_pair_keys()
-        hole_pair_index = all_hole_pair_keys.index(hole_pair_key)
+        hole_pair_index = poker_oracle.get_hole_pair_index(self.hole_cards)
         strategy_entry: np.ndarray = strategy[hole_pair_index]
         print(f"Player {self.name}'s hole pair:", *self.hole_cards)
         # NOTE: Choose action based on distribution from strategy
@@ -250,13 +244,8 @@ class PokerGameManager:
         card_deck.shuffle()
         for player in self.current_hand_players:
             player.recieve_hole_cards(card_deck.deal(2))
+        # NOTE: The same deck is used for all stages of the hand. Dealt hole cards and public cards are already out of the deck.
         while len(self.current_hand_players) > 1:
-            card_deck: CardDeck = self.poker_oracle.get_deck_of_cards()
-            card_deck.shuffle()
-            if not self.public_cards == []:
-                card_deck.exclude(self.public_cards)
-            for player in self.current_game_players:
-                card_deck.exclude(player.hole_cards)
             print()
             print(f"============ Start of {self.current_stage} stage ============")
             
@@ -277,33 +266,15 @@ class PokerGameManager:
                 if len(self.current_hand_players) >= 2:
                     print(f"SHOWDOWN with {len(self.current_hand_players)} players!")
                     
-                    for player in self.current_hand_players:
-                        is_winner = True
-                        for opponent in self.current_hand_players:
-                            if player == opponent:
-                                continue
-                            winner = self.poker_oracle.evaluate_showdown(self.public_cards, player.hole_cards, opponent.hole_cards)
-                            if winner == -1:
-                                is_winner = False
-                                break
-                        if is_winner:
-                            winners.append(player)
+                    all_hole_cards = [player.hole_cards for player in self.current_hand_players]
+                    winner_indices, _ = self.poker_oracle.evaluate_multiway(self.public_cards, all_hole_cards)
+                    winners = [self.current_hand_players[i] for i in winner_indices]
                     break # NOTE: This breaks out of the while loop
                        
             if len(self.current_hand_players) == 1:
                 winners.append(self.current_hand_players[0])
         
-        # Winner recieves pot
-        if len(winners) > 1:
-            print(f"It's a tie, split pot of {self.pot}!")
-            # Split pot if two players are tied. (Using integer division to avoid floating point numbers)
-            for player in self.current_hand_players:
-                player.recieve_winnings(self.pot//len(winners))  # NOTE: May get weird if there are an odd number of winners.
-        else:        
-            print(f"Player {winners[0]} won the hand and a pot of {self.pot} chips!")
-            winners[0].recieve_winnings(self.pot)
-        # Reset pot to prepare for new hand
-        self.pot = 0
+        self.pay_pot(winners)
         
         # Remove out of chips players
         for player in self.current_game_players:
@@ -318,7 +289,22 @@ class PokerGameManager:
         self.current_stage = "pre-flop"
         
         
+    def pay_pot(self, winners: list[PokerAgent]):
+        # Winner recieves pot
+        if len(winners) > 1:
+            print(f"It's a tie, split pot of {self.pot}!")
+            # Split pot if two players are tied. (Using integer division to avoid floating point numbers)
+            for player in winners:
+                player.recieve_winnings(self.pot//len(winners))  # NOTE: May get weird if there are an odd number of winners.
+        else:        
+            print(f"Player {winners[0]} won the hand and a pot of {self.pot} chips!")
+            winners[0].recieve_winnings(self.pot)
+        # Reset pot to prepare for new hand
+        self.pot = 0
+        
+        
 # MARK: Run one stage in hand            
+
     def run_one_stage(self, card_deck: CardDeck, small_blind_index: int, big_blind_index: int):    
             legal_num_raises = self.legal_num_raises_per_stage
             self.current_round_actions = []
@@ -0,0 +1,300 @@
+from card_deck import CARDS, SUITS, RANKS
+from collections import Counter
+from itertools import combinations, combinations_with_replacement
+import numpy as np
+
+# NOTE: A hand strength is a single integer where higher is better.
+# The hand category is stored from bit 20 and up, and below it are up to five
+# rank indices (rank - 2) of 4 bits each, ordered by significance.
+# E.g. two pair, kings and fives with a nine kicker is
+# (TWO_PAIR << 20) | (11 << 16) | (3 << 12) | (7 << 8)
+# so comparing two strengths compares category first and then every kicker.
+
+# MARK: Categories
+HIGH_CARD = 0
+PAIR = 1
+TWO_PAIR = 2
+THREE_OF_A_KIND = 3
+STRAIGHT = 4
+FLUSH = 5
+FULL_HOUSE = 6
+FOUR_OF_A_KIND = 7
+STRAIGHT_FLUSH = 8
+
+CATEGORY_SHIFT = 20
+
+CATEGORY_NAMES = ["high_card", "pair", "two_pair", "three_of_a_kind", "straight",
+                  "flush", "full_house", "four_of_a_kind", "straight_flush"]
+
+NUM_RANKS = len(RANKS)
+RANK_PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+
+# NOTE: Per card id lookups, so the evaluator never touches Card attributes
+CARD_RANK_INDICES: tuple[int] = tuple(card.rank - RANKS[0] for card in CARDS)
+CARD_SUIT_INDICES: tuple[int] = tuple(SUITS.index(card.suit) for card in CARDS)
+CARD_RANK_BITS: tuple[int] = tuple(1 << rank_index for rank_index in CARD_RANK_INDICES)
+CARD_PRIMES: tuple[int] = tuple(RANK_PRIMES[rank_index] for rank_index in CARD_RANK_INDICES)
+CARD_SUIT_COUNTS: tuple[int] = tuple(1 << (4 * suit_index) for suit_index in CARD_SUIT_INDICES)
+
+
+# MARK: Helpers
+
+def pack_ranks(rank_indices: list[int]) -> int:
+    # NOTE: First rank is the most significant one
+    packed = 0
+    for i, rank_index in enumerate(rank_indices[:5]):
+        packed |= rank_index << (4 * (4 - i))
+    return packed
+
+
+def get_straight_high_rank(rank_mask: int) -> int:
+    # Returns the rank index of the highest card in the best straight, or -1 if there is no straight.
+    # The ace also counts as the lowest card, so A-2-3-4-5 is a straight with the five as highest card.
+    for high in range(NUM_RANKS - 1, 3, -1):
+        straight_mask = 0b11111 << (high - 4)
+        if rank_mask & straight_mask == straight_mask:
+            return high
+    wheel_mask = (1 << (NUM_RANKS - 1)) | 0b1111
+    if rank_mask & wheel_mask == wheel_mask:
+        return 3
+    return -1
+
+
+def get_category(strength: int) -> int:
+    return strength >> CATEGORY_SHIFT
+
+
+def get_category_name(strength: int) -> str:
+    return CATEGORY_NAMES[get_category(strength)]
+
+
+# MARK: Scoring
+
+def score_five_ranks(rank_indices: list[int], is_flush: bool) -> int:
+    # NOTE: Reference scoring of five ranks. Only used to build the lookup tables.
+    rank_counts = Counter(rank_indices)
+    # Sort ranks by number of occurences first and rank second, e.g. [K, K, 5, 5, 9] -> [K, 5, 9]
+    groups = sorted(rank_counts.items(), key=lambda item: (item[1], item[0]), reverse=True)
+    ranks_by_group = [rank_index for rank_index, _ in groups]
+    counts = [count for _, count in groups]
+    rank_mask = 0
+    for rank_index in rank_indices:
+        rank_mask |= 1 << rank_index
+
+    straight_high_rank = get_straight_high_rank(rank_mask) if len(groups) == 5 else -1
+    if is_flush and straight_high_rank >= 0:
+        category, kickers = STRAIGHT_FLUSH, [straight_high_rank]
+    elif counts[0] == 4:
+        category, kickers = FOUR_OF_A_KIND, ranks_by_group
+    elif counts[0] == 3 and counts[1] == 2:
+        category, kickers = FULL_HOUSE, ranks_by_group
+    elif is_flush:
+        category, kickers = FLUSH, ranks_by_group
+    elif straight_high_rank >= 0:
+        category, kickers = STRAIGHT, [straight_high_rank]
+    elif counts[0] == 3:
+        category, kickers = THREE_OF_A_KIND, ranks_by_group
+    elif counts[0] == 2 and counts[1] == 2:
+        category, kickers = TWO_PAIR, ranks_by_group
+    elif counts[0] == 2:
+        category, kickers = PAIR, ranks_by_group
+    else:
+        category, kickers = HIGH_CARD, ranks_by_group
+    return (category << CATEGORY_SHIFT) | pack_ranks(kickers)
+
+
+
+def score_flush_mask(suit_mask: int) -> int:
+    straight_high_rank = STRAIGHT_HIGH_RANK_TABLE[suit_mask]
+    if straight_high_rank >= 0:
+        return (STRAIGHT_FLUSH << CATEGORY_SHIFT) | (straight_high_rank << 16)
+    return (FLUSH << CATEGORY_SHIFT) | TOP_RANKS_TABLE[suit_mask]
+
+
+def score_rank_masks(rank_mask: int, pair_mask: int, triple_mask: int, quad_mask: int) -> int:
+    # Strength of a hand without a flush. Kickers are the top ranks left after removing the grouped ranks.
+    if quad_mask:
+        quad_rank = HIGHEST_RANK_TABLE[quad_mask]
+        kickers = TOP_RANKS_TABLE[rank_mask ^ (1 << quad_rank)]
+        return (FOUR_OF_A_KIND << CATEGORY_SHIFT) | (quad_rank << 16) | ((kickers >> 4) & 0xF000)
+    if triple_mask:
+        triple_rank = HIGHEST_RANK_TABLE[triple_mask]
+        full_house_pair_mask = (triple_mask ^ (1 << triple_rank)) | pair_mask
+        if full_house_pair_mask:
+            return (FULL_HOUSE << CATEGORY_SHIFT) | (triple_rank << 16) | (HIGHEST_RANK_TABLE[full_house_pair_mask] << 12)
+    straight_high_rank = STRAIGHT_HIGH_RANK_TABLE[rank_mask]
+    if straight_high_rank >= 0:
+        return (STRAIGHT << CATEGORY_SHIFT) | (straight_high_rank << 16)
+    if triple_mask:
+        kickers = TOP_RANKS_TABLE[rank_mask ^ (1 << triple_rank)]
+        return (THREE_OF_A_KIND << CATEGORY_SHIFT) | (triple_rank << 16) | ((kickers >> 4) & 0xFF00)
+    if pair_mask:
+        high_pair_rank = HIGHEST_RANK_TABLE[pair_mask]
+        low_pair_mask = pair_mask ^ (1 << high_pair_rank)
+        if low_pair_mask:
+            low_pair_rank = HIGHEST_RANK_TABLE[low_pair_mask]
+            kickers = TOP_RANKS_TABLE[rank_mask ^ (1 << high_pair_rank) ^ (1 << low_pair_rank)]
+            return (TWO_PAIR << CATEGORY_SHIFT) | (high_pair_rank << 16) | (low_pair_rank << 12) | ((kickers >> 8) & 0x0F00)
+        kickers = TOP_RANKS_TABLE[rank_mask ^ (1 << high_pair_rank)]
+        return (PAIR << CATEGORY_SHIFT) | (high_pair_rank << 16) | ((kickers >> 4) & 0xFFF0)
+    return (HIGH_CARD << CATEGORY_SHIFT) | TOP_RANKS_TABLE[rank_mask]
+
+
+# MARK: Lookup tables
+
+def build_five_card_tables() -> tuple[list[int], list[int], dict[int, int]]:
+    # Flushes and hands with five different ranks are indexed by the 13 bit rank mask.
+    # All other hands are indexed by the product of the rank primes, which is unique for a multiset of ranks.
+    flush_table = [0] * (1 << NUM_RANKS)
+    unique_ranks_table = [0] * (1 << NUM_RANKS)
+    prime_product_table = {}
+    for rank_indices in combinations(range(NUM_RANKS), 5):
+        rank_mask = sum(1 << rank_index for rank_index in rank_indices)
+        flush_table[rank_mask] = score_five_ranks(rank_indices, is_flush=True)
+        unique_ranks_table[rank_mask] = score_five_ranks(rank_indices, is_flush=False)
+    for rank_indices in combinations_with_replacement(range(NUM_RANKS), 5):
+        rank_counts = Counter(rank_indices)
+        if len(rank_counts) == 5 or max(rank_counts.values()) > 4:
+            continue
+        prime_product = 1
+        for rank_index in rank_indices:
+            prime_product *= RANK_PRIMES[rank_index]
+        prime_product_table[prime_product] = score_five_ranks(rank_indices, is_flush=False)
+    return flush_table, unique_ranks_table, prime_product_table
+
+
+def build_rank_mask_tables() -> tuple[list[int], list[int], list[int]]:
+    # Tables indexed by a 13 bit rank mask, used to score flushes and rank counts
+    num_masks = 1 << NUM_RANKS
+    highest_rank_table = [-1] * num_masks
+    top_ranks_table = [0] * num_masks
+    straight_high_rank_table = [-1] * num_masks
+    for rank_mask in range(1, num_masks):
+        rank_indices = [rank_index for rank_index in range(NUM_RANKS - 1, -1, -1) if rank_mask & (1 << rank_index)]
+        highest_rank_table[rank_mask] = rank_indices[0]
+        top_ranks_table[rank_mask] = pack_ranks(rank_indices)
+        straight_high_rank_table[rank_mask] = get_straight_high_rank(rank_mask)
+    return highest_rank_table, top_ranks_table, straight_high_rank_table
+
+
+def build_rank_multiset_table() -> dict[int, int]:
+    # Strength of every 6 and 7 card hand without a flush, indexed by the product of the rank primes.
+    # The rank counts are enumerated directly and scored from their rank masks.
+    rank_multiset_table = {}
+    count_masks = [0] * 5
+    
+    def add_rank(rank_index: int, num_cards_left: int, prime_product: int):
+        if num_cards_left == 0:
+            rank_mask = count_masks[1] | count_masks[2] | count_masks[3] | count_masks[4]
+            rank_multiset_table[prime_product] = score_rank_masks(rank_mask, count_masks[2], count_masks[3], count_masks[4])
+            return
+        if rank_index == NUM_RANKS:
+            return
+        for count in range(min(4, num_cards_left) + 1):
+            if count > 0:
+                count_masks[count] |= 1 << rank_index
+            add_rank(rank_index + 1, num_cards_left - count, prime_product * RANK_PRIMES[rank_index] ** count)
+            if count > 0:
+                count_masks[count] ^= 1 << rank_index
+    
+    for num_cards in (6, 7):
+        add_rank(0, num_cards, 1)
+    return rank_multiset_table
+
+
+# NOTE: Built once when the module is imported
+FLUSH_TABLE, UNIQUE_RANKS_TABLE, PRIME_PRODUCT_TABLE = build_five_card_tables()
+HIGHEST_RANK_TABLE, TOP_RANKS_TABLE, STRAIGHT_HIGH_RANK_TABLE = build_rank_mask_tables()
+RANK_MULTISET_TABLE = build_rank_multiset_table()
+
+
+def build_batch_tables() -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # NumPy versions of the tables for evaluate_batch.
+    # Prime products of 5, 6 and 7 card rank multisets never collide, so they share one sorted key array.
+    rank_strengths = dict(RANK_MULTISET_TABLE)
+    rank_strengths.update(PRIME_PRODUCT_TABLE)
+    for rank_indices in combinations(range(NUM_RANKS), 5):
+        prime_product = 1
+        rank_mask = 0
+        for rank_index in rank_indices:
+            prime_product *= RANK_PRIMES[rank_index]
+            rank_mask |= 1 << rank_index
+        rank_strengths[prime_product] = UNIQUE_RANKS_TABLE[rank_mask]
+    prime_products = np.asarray(sorted(rank_strengths), dtype=np.int64)
+    strengths = np.asarray([rank_strengths[prime_product] for prime_product in prime_products], dtype=np.int32)
+    flush_strengths = np.asarray([score_flush_mask(suit_mask) for suit_mask in range(1 << NUM_RANKS)], dtype=np.int32)
+    return prime_products, strengths, flush_strengths
+
+
+BATCH_PRIME_PRODUCTS, BATCH_RANK_STRENGTHS, BATCH_FLUSH_STRENGTHS = build_batch_tables()
+CARD_PRIME_ARRAY = np.asarray(CARD_PRIMES, dtype=np.int64)
+CARD_SUIT_ARRAY = np.asarray(CARD_SUIT_INDICES, dtype=np.int8)
+CARD_RANK_BIT_ARRAY = np.asarray(CARD_RANK_BITS, dtype=np.int32)
+
+
+# MARK: Evaluation
+
+def evaluate_five_cards(card_ids: list[int]) -> int:
+    card_1, card_2, card_3, card_4, card_5 = card_ids
+    rank_mask = (CARD_RANK_BITS[card_1] | CARD_RANK_BITS[card_2] | CARD_RANK_BITS[card_3]
+                 | CARD_RANK_BITS[card_4] | CARD_RANK_BITS[card_5])
+    suit = CARD_SUIT_INDICES[card_1]
+    if (suit == CARD_SUIT_INDICES[card_2] == CARD_SUIT_INDICES[card_3]
+        == CARD_SUIT_INDICES[card_4] == CARD_SUIT_INDICES[card_5]):
+        return FLUSH_TABLE[rank_mask]
+    strength = UNIQUE_RANKS_TABLE[rank_mask]
+    if strength:
+        return strength
+    return PRIME_PRODUCT_TABLE[CARD_PRIMES[card_1] * CARD_PRIMES[card_2] * CARD_PRIMES[card_3]
+                               * CARD_PRIMES[card_4] * CARD_PRIMES[card_5]]
+
+
+def evaluate_seven_cards(card_ids: list[int]) -> int:
+    # NOTE: Scores 6 or 7 cards in one pass without looking at five card subsets.
+    # Suits are counted in 4 bit fields. Adding 3 to every field sets its top bit when a suit has 5 or more cards.
+    # Without a flush the strength only depends on the ranks, and is looked up by the product of the rank primes.
+    suit_counts = 0
+    prime_product = 1
+    for card in card_ids:
+        suit_counts += CARD_SUIT_COUNTS[card]
+        prime_product *= CARD_PRIMES[card]
+    flush_bits = (suit_counts + 0x3333) & 0x8888
+    if flush_bits:
+        # NOTE: With at most 7 cards a flush rules out four of a kind and full house
+        flush_suit = (flush_bits.bit_length() - 1) // 4
+        suit_mask = 0
+        for card in card_ids:
+            if CARD_SUIT_INDICES[card] == flush_suit:
+                suit_mask |= CARD_RANK_BITS[card]
+        return score_flush_mask(suit_mask)
+    return RANK_MULTISET_TABLE[prime_product]
+
+
+def evaluate_cards(card_ids: list[int]) -> int:
+    # NOTE: Best five card hand of a set of 5 to 7 cards
+    if len(card_ids) == 5:
+        return evaluate_five_cards(card_ids)
+    return evaluate_seven_cards(card_ids)
+
+
+def evaluate_batch(cards: np.ndarray) -> np.ndarray:
+    # NOTE: Scores N hands at once. cards is an (N, 5), (N, 6) or (N, 7) array of distinct card ids per row.
+    # Same strengths as evaluate_cards, using the same tables through array lookups.
+    cards = np.asarray(cards, dtype=np.intp)
+    if cards.ndim != 2 or not 5 <= cards.shape[1] <= 7:
+        raise ValueError(f"Expected an (N, 5..7) array of card ids, got shape {cards.shape}")
+    prime_products = np.prod(CARD_PRIME_ARRAY[cards], axis=1)
+    rank_indices = np.searchsorted(BATCH_PRIME_PRODUCTS, prime_products)
+    strengths = BATCH_RANK_STRENGTHS[rank_indices]
+    
+    card_suits = CARD_SUIT_ARRAY[cards]
+    suit_counts = np.stack([np.count_nonzero(card_suits == suit, axis=1) for suit in range(len(SUITS))], axis=1)
+    flush_suits = np.argmax(suit_counts, axis=1)
+    is_flush = suit_counts[np.arange(len(cards)), flush_suits] >= 5
+    if np.any(is_flush):
+        flush_cards = cards[is_flush]
+        in_flush_suit = card_suits[is_flush] == flush_suits[is_flush, None]
+        # NOTE: Cards of one suit have different ranks, so the sum of rank bits is the suit's rank mask
+        suit_masks = np.sum(CARD_RANK_BIT_ARRAY[flush_cards] * in_flush_suit, axis=1)
+        strengths[is_flush] = BATCH_FLUSH_STRENGTHS[suit_masks]
+    return strengths
@@ -1,5 +1,5 @@
 from card_deck import CardDeck, Card
-from poker_oracle import PokerOracle
+from poker_oracle import PokerOracle, UtilityMatrixCache
 import numpy as np
 import matplotlib.pyplot as plt
 
@@ -113,34 +113,19 @@ def save_loss_plot(loss_list: np.ndarray, file_name: str):
 # MARK: DATA SET GENERATION
 
 def generate_random_ranges(public_cards: list[Card], poker_oracle: PokerOracle):
-    exclude_cards: list[str] = []
-    for card in public_cards:
-        card_key = str(card.get_rank()) + card.get_suit()
-        exclude_cards.append(card_key)
-        
-    hole_pair_keys: list[str] = poker_oracle.get_all_hole_pair_keys()
-    num_hole_pairs = len(hole_pair_keys)
-    player1_range = np.zeros(num_hole_pairs)
-    player2_range = np.zeros(num_hole_pairs)
+    # NOTE: Hole pairs holding a public card are impossible and get probability 0
+    is_possible = poker_oracle.get_possible_hole_pairs(public_cards)
+    num_possible_hole_pairs = np.count_nonzero(is_possible)
+    player1_range = np.zeros(len(is_possible))
+    player2_range = np.zeros(len(is_possible))
     
-    num_non_zero_probabilities = num_hole_pairs - len(public_cards)
-    player1_random_probabilities = np.random.rand(num_non_zero_probabilities)
+    player1_random_probabilities = np.random.rand(num_possible_hole_pairs)
     player1_random_probabilities = player1_random_probabilities / np.sum(player1_random_probabilities)
-    player2_random_probabilities = np.random.rand(num_non_zero_probabilities)
+    player2_random_probabilities = np.random.rand(num_possible_hole_pairs)
     player2_random_probabilities = player2_random_probabilities / np.sum(player2_random_probabilities)
     
-    prob_index_1, prob_index_2 = 0, 0
-    for i in range(num_hole_pairs):
-        hole_pair_is_possible = True
-        for card in exclude_cards:
-            if card in hole_pair_keys[i]:
-                hole_pair_is_possible = False
-                break
-        if hole_pair_is_possible:
-            player1_range[i] = player1_random_probabilities[prob_index_1]
-            player2_range[i] = player2_random_probabilities[prob_index_2]
-            prob_index_1 += 1
-            prob_index_2 += 1
+    player1_range[is_possible] = player1_random_probabilities
+    player2_range[is_possible] = player2_random_probabilities
             
     return player1_range, player2_range
     
@@ -160,7 +145,9 @@ def encode_public_cards(public_cards: list[Card], use_limited_deck: bool):
     
     
 # NOTE: Based on "Cheap method" from slides
-def generate_training_data_for_stage(stage: str, num_cases: int, use_limited_deck: bool, save_to_file: bool):
+def generate_training_data_for_stage(stage: str, num_cases: int, use_limited_deck: bool, save_to_file: bool, 
+                                     utility_matrix_cache: UtilityMatrixCache | None = None):
+    # NOTE: Pass a utility matrix cache, e.g. the one used by a resolver, to share matrices of boards seen before
     stage_to_num_public_cards = {
         "flop": 3,
         "turn": 4,
@@ -176,7 +163,7 @@ def generate_training_data_for_stage(stage: str, num_cases: int, use_limited_dec
     
     num_public_cards = stage_to_num_public_cards[stage]
     
-    poker_oracle = PokerOracle(use_limited_deck)
+    poker_oracle = PokerOracle(use_limited_deck, utility_matrix_cache)
     
     training_data = []
     for _ in range(num_cases):
@@ -190,7 +177,7 @@ def generate_training_data_for_stage(stage: str, num_cases: int, use_limited_dec
         p1_range, p2_range = generate_random_ranges(public_cards, poker_oracle)
         # print("Ranges",len(p1_range))
         
-        utility_matrix, _ = poker_oracle.utility_matrix_generator(public_cards)
+        utility_matrix = poker_oracle.get_utility_matrix(public_cards)
         
         p1_evaluation = np.squeeze(np.matmul(utility_matrix, np.atleast_2d(p2_range).T))
         p2_evaluation = -1 * np.matmul(p1_range, utility_matrix)
@@ -1,33 +1,37 @@
 import numpy as np
 import torch
-from state_manager import PokerStateManager, PlayerState, ChanceState, TerminalState
+from state_manager import PokerStateManager, PlayerState, ChanceState, TerminalState, PublicGameTree
 from poker_oracle import PokerOracle
 from card_deck import Card, CardDeck
 from neural_networks import NeuralNetwork, load_model_from_file, encode_public_cards
 
 class Resolver:
 
-    def __init__(self, state_manager: PokerStateManager, poker_oracle: PokerOracle):
+    def __init__(self, state_manager: PokerStateManager, poker_oracle: PokerOracle, lazy_tree_expansion: bool = False, skip_unreachable_actions: bool = False):
         self.state_manager = state_manager
         self.poker_oracle = poker_oracle
+        self.utility_matrix_cache = poker_oracle.utility_matrix_cache
+        
+        # NOTE: With lazy tree expansion the subtree is generated during the traversals instead of up front.
+        # Skipping unreachable actions does not traverse actions that no hole pair in the acting player's range would take. 
+        # Their evaluations are then 0, which only differs from the full traversal for hole pairs outside the range.
+        self.lazy_tree_expansion = lazy_tree_expansion
+        self.skip_unreachable_actions = skip_unreachable_actions
         
         self.action_to_index = {"fold": 0, "call": 1, "raise": 2}
 
 # MARK: Resolve
 
     def resolve(self, state: PlayerState, acting_player_range: np.ndarray, other_player_range: np.ndarray, end_stage: str, end_depth: int, num_rollouts: int) -> np.ndarray:
-            initial_strategy = self.get_initial_strategy()
-            state.set_strategy_matrix(initial_strategy)
-            root_node = self.generate_initial_subtree(state, end_stage, end_depth)
+            game_tree = self.generate_initial_subtree(state, end_stage, end_depth)
+            game_tree.set_strategy_matrices(self.get_initial_strategy())
+            root_node = 0
                     
             strategy_matrices = []
             for _ in range(num_rollouts):
-                acting_player_evaluation, other_player_evaluation = self.subtree_traversal_rollout(state, acting_player_range, other_player_range, end_stage, end_depth)
-                
-                root_node.acting_player_evaluation = acting_player_evaluation
-                root_node.other_player_evaluation = other_player_evaluation
+                self.subtree_traversal_rollout(game_tree, root_node, acting_player_range, other_player_range, end_stage, end_depth)
       
-                strategy_matrix = self.update_strategy(root_node)
+                strategy_matrix = self.update_strategy(game_tree, root_node)
                 
                 # NOTE: QUICK FIX for handlig nan values in strategy!
                 
@@ -48,90 +52,97 @@ class Resolver:
 
 # MARK: Subtree traversal
 
-    def generate_initial_subtree(self, state: PlayerState, end_stage: str, end_depth: int) -> PlayerState:
-        self.state_manager.generate_subtree_to_given_stage_and_depth(state, end_stage, end_depth)
-        return state
+    def generate_initial_subtree(self, state: PlayerState, end_stage: str, end_depth: int) -> PublicGameTree:
+        # NOTE: The subtree is flattened into arrays. Every player node has its own strategy and regrets, 
+        # starting from the initial strategy.
+        if self.lazy_tree_expansion:
+            return self.state_manager.generate_lazy_game_tree(state, self.poker_oracle.num_hole_pairs)
+        return self.state_manager.generate_game_tree(state, end_stage, end_depth, self.poker_oracle.num_hole_pairs)
 
 
-    def subtree_traversal_rollout(self, state: PlayerState|ChanceState|TerminalState, acting_player_range: np.ndarray, other_player_range: np.ndarray, end_stage: str, end_depth: int) -> tuple[np.ndarray]:
+    def subtree_traversal_rollout(self, game_tree: PublicGameTree, node: int, acting_player_range: np.ndarray, other_player_range: np.ndarray, end_stage: str, end_depth: int) -> tuple[np.ndarray]:
         stage_dict = {"pre-flop": 0,
                 "flop": 1,
                 "turn": 2,
                 "river": 3,
                 "showdown": 4}
         
-        if self.is_showdown_state(state):
-            # TODO: GENERATING UTILITY MATRICES TAKSE TIME. SHOULD MAYBE STORE MATRICES.
-            utility_matrix = self.get_utility_matrix_from_state(state)
-            acting_player_evaluation = np.squeeze(np.matmul(utility_matrix, np.atleast_2d(other_player_range).T))
-            other_player_evaluation = -1 * np.matmul(acting_player_range, utility_matrix)
-            # print("SHOWDOWN:", state.stage, state.depth)
-            
-        elif stage_dict[state.stage] >= stage_dict[end_stage] and state.depth >= end_depth:
-            acting_player_evaluation, other_player_evaluation = self.run_neural_network(state.stage, state, acting_player_range, other_player_range)
-            # print("NEURAL NET:", state.stage, state.depth)
+        node_type = game_tree.get_node_type(node)
+        stage = game_tree.get_stage(node)
+        depth = game_tree.depths[node]
+        
+        if node_type == "showdown":
+            utility_matrix = self.get_utility_matrix_from_node(game_tree, node)
+            acting_player_evaluation = utility_matrix @ other_player_range
+            other_player_evaluation = -1 * (acting_player_range @ utility_matrix)
             
-        elif stage_dict[state.stage] > stage_dict[end_stage]:
-            acting_player_evaluation = np.zeros(len(self.get_all_hole_pairs()))
-            other_player_evaluation = np.zeros(len(self.get_all_hole_pairs()))
+        elif stage_dict[stage] >= stage_dict[end_stage] and depth >= end_depth:
+            acting_player_evaluation, other_player_evaluation = self.run_neural_network(stage, game_tree.get_public_cards(node), game_tree.pots[node], 
+                                                                                        acting_player_range, other_player_range)
             
-        elif isinstance(state, TerminalState):
-            acting_player_evaluation = np.zeros(len(self.get_all_hole_pairs()))
-            other_player_evaluation = np.zeros(len(self.get_all_hole_pairs()))
+        elif stage_dict[stage] > stage_dict[end_stage] or node_type == "terminal":
+            acting_player_evaluation = np.zeros(self.poker_oracle.num_hole_pairs)
+            other_player_evaluation = np.zeros(self.poker_oracle.num_hole_pairs)
           
-        elif self.is_player_state(state):
-            acting_player_evaluation = np.zeros(len(self.get_all_hole_pairs()))
-            other_player_evaluation = np.zeros(len(self.get_all_hole_pairs()))
-            # print(state.actions_to_children)
-            for action in state.actions_to_children: 
-                acting_player_range_current_action = acting_player_range
-                acting_player_range_current_action = self.bayesian_range_update(acting_player_range_current_action, action, state.get_strategy_matrix())
-                other_player_range_current_action = other_player_range
-                state_after_action = PokerStateManager.get_child_state_by_action(state, action) # NOTE: This only gets children that are player states
-                other_player_evaluation_current_action, acting_player_evaluation_current_action = self.subtree_traversal_rollout(state_after_action, other_player_range_current_action, acting_player_range_current_action, end_stage, end_depth)
-                for h in range(len(self.get_all_hole_pairs())):
-                    a = self.action_to_index[action]
-                    acting_player_evaluation[h] += state.get_strategy_matrix()[h][a] * acting_player_evaluation_current_action[h]
-                    other_player_evaluation[h] += state.get_strategy_matrix()[h][a] * other_player_evaluation_current_action[h]
-            # print("PLAYER STATE:", acting_player_evaluation, other_player_evaluation)
-            for child in state.children:
-                if isinstance(child, ChanceState): # NOTE: IF it is a chance state, then it has not yet been visited
-                    other_player_evaluation_current_action, acting_player_evaluation_current_action = self.subtree_traversal_rollout(child, other_player_range, acting_player_range, end_stage, end_depth)
-                    for h in range(len(self.get_all_hole_pairs())):
-                        a = self.action_to_index["call"] # NOTE: QUICK FIX: ASSUMING CHANCE STATE IS ALWAYS THE RESULT OF A CALL
-                        acting_player_evaluation[h] += state.get_strategy_matrix()[h][a] * acting_player_evaluation_current_action[h]
-                        other_player_evaluation[h] += state.get_strategy_matrix()[h][a] * other_player_evaluation_current_action[h]
-            # print("PLAYER STATE:", state.stage, state.depth)    
+        elif node_type == "player":
+            if node in game_tree.unexpanded_states:
+                self.state_manager.expand_game_tree_node(game_tree, node)
+            acting_player_evaluation = np.zeros(self.poker_oracle.num_hole_pairs)
+            other_player_evaluation = np.zeros(self.poker_oracle.num_hole_pairs)
+            strategy_matrix = game_tree.get_strategy_matrix(node)
+            for child in game_tree.get_children(node):
+                if game_tree.get_node_type(child) == "chance":
+                    # NOTE: QUICK FIX: ASSUMING CHANCE STATE IS ALWAYS THE RESULT OF A CALL
+                    a = self.action_to_index["call"]
+                    acting_player_range_current_action = acting_player_range
+                else:
+                    a = game_tree.origin_actions[child]
+                    if a < 0 or game_tree.child_by_action[game_tree.player_rows[node], a] != child:
+                        continue
+                    acting_player_range_current_action = self.bayesian_range_update(acting_player_range, PublicGameTree.ACTIONS[a], strategy_matrix)
+                if self.skip_unreachable_actions and not np.any(acting_player_range * strategy_matrix[:, a]):
+                    game_tree.acting_player_evaluations[child] = 0
+                    game_tree.other_player_evaluations[child] = 0
+                    continue
+                other_player_evaluation_current_action, acting_player_evaluation_current_action = self.subtree_traversal_rollout(game_tree, child, other_player_range, acting_player_range_current_action, end_stage, end_depth)
+                acting_player_evaluation += strategy_matrix[:, a] * acting_player_evaluation_current_action
+                other_player_evaluation += strategy_matrix[:, a] * other_player_evaluation_current_action
+                
         else:
-            # NOTE: Assumes that the state is a chance node
-            acting_player_evaluation = np.zeros(len(self.get_all_hole_pairs()))
-            other_player_evaluation = np.zeros(len(self.get_all_hole_pairs()))
-            if not isinstance(state, TerminalState): # Assuming a zero evaluation is bad
-                for event in state.child_events:
-                    state_after_event = PokerStateManager.get_player_state_after_event(state, event)
-                    acting_player_evaluation_current_event, other_player_evaluation_current_event = self.subtree_traversal_rollout(state_after_event, acting_player_range, other_player_range, end_stage, end_depth)
-                    for h in range(len(self.get_all_hole_pairs())): # NOTE: Scaled update of evaluations
-                        acting_player_evaluation[h] += acting_player_evaluation_current_event[h] / len(state.child_events)
-                        other_player_evaluation[h] += other_player_evaluation_current_event[h] / len(state.child_events)
-                # print("CHANCE STATE:", state.stage)
-        state.acting_player_evaluation = acting_player_evaluation
-        state.other_player_evaluation = other_player_evaluation
+            # NOTE: Chance node, averaging over the player states after each event
+            if node in game_tree.unexpanded_states:
+                self.state_manager.expand_game_tree_node(game_tree, node)
+            acting_player_evaluation = np.zeros(self.poker_oracle.num_hole_pairs)
+            other_player_evaluation = np.zeros(self.poker_oracle.num_hole_pairs)
+            events = game_tree.get_children(node)
+            for state_after_event in events:
+                # NOTE: Events are dealt from the public cards only, so hole pairs holding an event card are removed from the ranges
+                possible_hole_pairs = self.poker_oracle.get_possible_hole_pairs(game_tree.get_public_cards(state_after_event))
+                acting_player_evaluation_current_event, other_player_evaluation_current_event = self.subtree_traversal_rollout(game_tree, state_after_event, 
+                                                                                                                              acting_player_range * possible_hole_pairs, 
+                                                                                                                              other_player_range * possible_hole_pairs, 
+                                                                                                                              end_stage, end_depth)
+                acting_player_evaluation += acting_player_evaluation_current_event / len(events)
+                other_player_evaluation += other_player_evaluation_current_event / len(events)
+                
+        game_tree.acting_player_evaluations[node] = acting_player_evaluation
+        game_tree.other_player_evaluations[node] = other_player_evaluation
         return acting_player_evaluation, other_player_evaluation
 
 
 # MARK: Evaulations and updates
 
-    def get_utility_matrix_from_state(self, state: PlayerState) -> np.ndarray:
-        utility_matrix, _ = self.poker_oracle.utility_matrix_generator(state.public_cards)
-        return utility_matrix
+    def get_utility_matrix_from_node(self, game_tree: PublicGameTree, node: int) -> np.ndarray:
+        # NOTE: Utility matrices are cached per board by the oracle, so repeated boards within and across resolves are only generated once
+        return self.poker_oracle.get_utility_matrix(game_tree.get_public_cards(node))
 
 
-    def run_neural_network(self, stage: str, state: PlayerState, acting_player_range: np.ndarray, other_player_range: np.ndarray) -> tuple[np.ndarray]:
+    def run_neural_network(self, stage: str, public_cards: list[Card | int], pot: float, acting_player_range: np.ndarray, other_player_range: np.ndarray) -> tuple[np.ndarray]:
         
         if stage == "pre-flop":
             # NOTE: This should never be called from a pre-flop state.
-            acting_eval = np.random.uniform(size=len(self.get_all_hole_pairs()))
-            other_eval = np.random.uniform(size=len(self.get_all_hole_pairs()))
+            acting_eval = np.random.uniform(size=self.poker_oracle.num_hole_pairs)
+            other_eval = np.random.uniform(size=self.poker_oracle.num_hole_pairs)
             return acting_eval, other_eval
         
         use_limited = self.poker_oracle.use_limited_deck
@@ -140,7 +151,7 @@ class Resolver:
         
         neural_network = load_model_from_file(f"{file_prefix}_100epochs")
         
-        encoded_public_cards = encode_public_cards(state.public_cards, use_limited)
+        encoded_public_cards = encode_public_cards(public_cards, use_limited)
         
         stage_max_pot = {
             "flop": 40,
@@ -148,7 +159,7 @@ class Resolver:
             "river": 80
         }
         
-        relative_pot = [state.pot / stage_max_pot[stage]]
+        relative_pot = [pot / stage_max_pot[stage]]
         
         neural_network_input = [*acting_player_range, *encoded_public_cards, *relative_pot, *other_player_range]
         
@@ -172,34 +183,11 @@ class Resolver:
         return acting_player_evaluation, other_player_evaluation
 
 
-    def update_strategy(self, state: PlayerState) -> np.ndarray:
-        for child in state.children:
-            if self.is_player_state(child):
-                self.update_strategy(child)
-        if self.is_player_state(state):
-            cumulative_regret = state.cumulative_regret 
-            positive_regret = state.positive_regret 
-            for h in range(len(self.get_all_hole_pairs())):
-                for action in state.actions_to_children:
-                    a = self.action_to_index[action]
-                    state_after_action: PlayerState = PokerStateManager.get_child_state_by_action(state, action)
-                    cumulative_regret[h][a] += (state_after_action.other_player_evaluation[h] - state.acting_player_evaluation[h])
-                    # NOTE: 
-                    # Seems like cumulative regret often negative. Leads to positive regrets becoming 0.
-                    # Quick fix with 0.001 instead of 0
-                    positive_regret[h][a] = np.maximum(0.001, cumulative_regret[h][a]) 
-            state.cumulative_regret = cumulative_regret
-            state.positive_regret = positive_regret
-            
-            strategy_matrix = state.get_strategy_matrix()
-            for h in range(len(self.get_all_hole_pairs())):
-                for action in state.actions_to_children:
-                    a = self.action_to_index[action]
-                    strategy_matrix[h][a] = state.positive_regret[h][a] / np.sum(state.positive_regret[h])
-            
-            state.set_strategy_matrix(strategy_matrix)
-            
-        return strategy_matrix
+    def update_strategy(self, game_tree: PublicGameTree, node: int) -> np.ndarray:
+        # NOTE: Updates the regrets and strategies of every player node of the tree at once, see PublicGameTree.update_regrets.
+        # Returns a copy of the strategy of the node.
+        game_tree.update_regrets()
+        return game_tree.get_strategy_matrix(node).astype(float)
             
             
     # NOTE Based on slides page 63
@@ -220,62 +208,22 @@ class Resolver:
     def get_initial_ranges(self, public_cards: list[Card], acting_player_cards: list[Card]) -> tuple[np.ndarray]:    
         # NOTE: Correct number of hole pair keys is 1326 for full deck
         # and 276 for limited deck. 
-        hole_pair_keys: list[str] = self.poker_oracle.get_all_hole_pair_keys()
+        # Hole pairs holding a public card are impossible for both players. 
+        # Acting players cards has to be exluded from other player ranges.
+        acting_player_ranges = self.poker_oracle.get_possible_hole_pairs(public_cards).astype(float)
+        acting_player_ranges = acting_player_ranges / np.sum(acting_player_ranges)
         
-        acting_player_exclude_cards = []
-        for card in public_cards:
-            card_key = str(card.get_rank()) + card.get_suit()
-            acting_player_exclude_cards.append(card_key)
-    
-        acting_player_ranges = np.zeros(len(hole_pair_keys))
-        
-        for i in range(len(acting_player_ranges)):
-            hole_pair_is_possible = True
-            for card in acting_player_exclude_cards:
-                # Public card is part of the current hole pair, thus hole pair is impossible
-                # Check if card string is substring of hole pair string
-                if card in hole_pair_keys[i]:
-                    hole_pair_is_possible = False
-                    break
-            if hole_pair_is_possible:
-                acting_player_ranges[i] = 1
-            
-        num_possible_hands = np.sum(acting_player_ranges)
-        uniform_probability = 1 / num_possible_hands
-        
-        acting_player_ranges = acting_player_ranges * uniform_probability
-        
-        # Acting players cards has to be exluded from other player ranges      
-        other_player_exclude_cards = acting_player_exclude_cards
-        for card in acting_player_cards:
-            card_key = str(card.get_rank()) + card.get_suit()
-            other_player_exclude_cards.append(card_key)
+        other_player_ranges = self.poker_oracle.get_possible_hole_pairs([*public_cards, *acting_player_cards]).astype(float)
+        other_player_ranges = other_player_ranges / np.sum(other_player_ranges)
         
-        other_player_ranges = np.zeros(len(hole_pair_keys))
-        
-        for i in range(len(other_player_ranges)):
-            hole_pair_is_possible = True
-            for card in other_player_exclude_cards:
-                if card in hole_pair_keys[i]:
-                    hole_pair_is_possible = False
-                    break
-            if hole_pair_is_possible:
-                other_player_ranges[i] = 1
-                
-        num_possible_hands = np.sum(other_player_ranges)
-        uniform_probability = 1 / num_possible_hands
-        
-        other_player_ranges = other_player_ranges * uniform_probability
-        
-        return np.asarray(acting_player_ranges), np.asarray(other_player_ranges)
+        return acting_player_ranges, other_player_ranges
     
     
     def get_initial_strategy(self) -> np.ndarray:
-        hole_pair_keys: list[str] = self.poker_oracle.get_all_hole_pair_keys()
         actions = list(self.action_to_index.keys())
         num_actions = len(actions)
         strategy_matrix = []
-        for _ in range(len(hole_pair_keys)):
+        for _ in range(self.poker_oracle.num_hole_pairs):
             action_distribution = np.ones(num_actions) * 1/num_actions
             strategy_matrix.append(action_distribution)
             
@@ -333,8 +281,6 @@ if __name__ == "__main__":
     for player in game_manager.poker_agents:
         player.recieve_hole_cards(card_deck.deal(2))
     
-    strategy = resolver.get_initial_strategy()
-    
     public_cards = card_deck.deal(4)
         
     root_state = state_manager.generate_root_state(acting_player=game_manager.poker_agents[0], 
@@ -345,8 +291,7 @@ if __name__ == "__main__":
                                                 bet_to_call=game_manager.current_bet,
                                                 stage="turn",
                                                 initial_round_action_history=[],
-                                                initial_depth=0,
-                                                strategy_matrix=strategy
+                                                initial_depth=0
                                                 )
     
     # Assuming alice is acting player
@@ -1,14 +1,19 @@
-from card_deck import CardDeck, Card
+from card_deck import CardDeck, Card, get_card
 import copy
 import numpy as np
 
 # MARK: PlayerState
 class PlayerState:
-    def __init__(self, acting_player, players, current_state_acting_player, public_cards: Card, pot: int, num_raises_left: int, 
-                 bet_to_call: int, stage: str, origin_action: str, round_action_history: list[str], depth: int, strategy_matrix: np.ndarray | None):
+    # NOTE: Public state only. Players are seat indices into the players at the root of the tree, and the bets and stacks
+    # are arrays indexed by seat. There are no hole cards, so the same state is valid for any private holdings.
+    def __init__(self, acting_player: int, players: tuple[int, ...], current_state_acting_player: int, bets: np.ndarray, stacks: np.ndarray, 
+                 public_cards: list[Card], pot: int, num_raises_left: int, bet_to_call: int, stage: str, origin_action: str, 
+                 round_action_history: list[str], depth: int):
         self.acting_player = acting_player
         self.players = players
         self.current_state_acting_player = current_state_acting_player
+        self.bets = bets
+        self.stacks = stacks
         self.public_cards = public_cards
         self.pot = pot
         self.num_raises_left = num_raises_left
@@ -18,29 +23,11 @@ class PlayerState:
         
         self.depth = depth
         
-        self._strategy_matrix = strategy_matrix
-        # NOTE: Assume cumulative and positive regret has 
-        # same "shape" as strategy matrix, but with 
-        # 0 as initial values
-        if strategy_matrix is None:
-            self.cumulative_regret = None
-            self.positive_regret = None
-        else:
-            self.cumulative_regret = strategy_matrix * 0
-            self.positive_regret = strategy_matrix * 0
-        self.acting_player_evaluation = None
-        self.other_player_evaluation = None
-        
+        # NOTE: Strategies, regrets and evaluations are stored per node in PublicGameTree
         self.round_action_history = round_action_history
         self.origin_action = origin_action
         self.children = []
         self.actions_to_children = []
-        
-    def set_strategy_matrix(self, strategy_matrix: np.ndarray):
-        self._strategy_matrix = strategy_matrix
-        
-    def get_strategy_matrix(self):
-        return self._strategy_matrix
      
      
 # MARK: ChanceState        
@@ -63,7 +50,7 @@ class ChanceState:
 # MARK: TerminalState        
 class TerminalState:
     
-    def __init__(self, acting_player, players, pot: int, origin_action: str, depth: int, stage: str, winner = None):
+    def __init__(self, acting_player: int, players: tuple[int, ...], pot: int, origin_action: str, depth: int, stage: str, winner: int | None = None):
         self.acting_player = acting_player
         self.players = players
         self.pot = pot
@@ -76,6 +63,181 @@ class TerminalState:
         self.children = []
 
 
+# MARK: Game tree
+class PublicGameTree:
+    # NOTE: Struct of arrays representation of a subtree built by the state manager.
+    # Node attributes live in one numpy array each, indexed by node. The children of a node are contiguous,
+    # starting at first_children[node]. Player nodes also have a row in the (player nodes x H x A) float32 tensors 
+    # of strategies and regrets, so regret and strategy updates of the whole tree are single array operations.
+    # Chance nodes have the player states after each event as children. Showdown nodes are leaves.
+    NODE_TYPES = ("player", "chance", "showdown", "terminal")
+    STAGES = ("pre-flop", "flop", "turn", "river", "showdown")
+    ACTIONS = ("fold", "call", "raise")
+    # NOTE: Arrays describing the shape of the tree, shared by the instances of a template
+    STRUCTURE_ARRAYS = ("node_types", "stages", "depths", "pots", "parents", "first_children", "num_children", 
+                        "origin_actions", "player_rows", "player_nodes", "child_by_action")
+    
+    def __init__(self, num_hole_pairs: int, capacity: int = 64):
+        self.num_hole_pairs = num_hole_pairs
+        self.num_actions = len(PublicGameTree.ACTIONS)
+        self.num_nodes = 0
+        self.num_player_nodes = 0
+        
+        self.node_types = np.zeros(capacity, dtype=np.int8)
+        self.stages = np.zeros(capacity, dtype=np.int8)
+        self.depths = np.zeros(capacity, dtype=np.int16)
+        self.pots = np.zeros(capacity, dtype=np.float32)
+        self.parents = np.full(capacity, -1, dtype=np.int32)
+        self.first_children = np.full(capacity, -1, dtype=np.int32)
+        self.num_children = np.zeros(capacity, dtype=np.int32)
+        self.origin_actions = np.full(capacity, -1, dtype=np.int8)
+        self.player_rows = np.full(capacity, -1, dtype=np.int32)
+        # NOTE: Card ids of the public cards of each node, padded with -1
+        self.public_cards = np.full((capacity, 5), -1, dtype=np.int8)
+        self.acting_player_evaluations = np.zeros((capacity, num_hole_pairs), dtype=np.float32)
+        self.other_player_evaluations = np.zeros((capacity, num_hole_pairs), dtype=np.float32)
+        
+        # NOTE: Indexed by player row
+        self.player_nodes = np.full(capacity, -1, dtype=np.int32)
+        self.child_by_action = np.full((capacity, self.num_actions), -1, dtype=np.int32)
+        self.strategies = np.zeros((capacity, num_hole_pairs, self.num_actions), dtype=np.float32)
+        self.cumulative_regrets = np.zeros((capacity, num_hole_pairs, self.num_actions), dtype=np.float32)
+        self.positive_regrets = np.zeros((capacity, num_hole_pairs, self.num_actions), dtype=np.float32)
+        
+        # NOTE: States of the nodes whose children are not added yet, only used by lazily expanded trees
+        self.unexpanded_states: dict[int, PlayerState | ChanceState] = {}
+        
+    def __len__(self) -> int:
+        return self.num_nodes
+    
+    def add_node(self, node_type: str, stage: str, depth: int, pot: float, public_cards: list[Card], 
+                 parent: int = -1, origin_action: str | None = None) -> int:
+        if self.num_nodes == len(self.node_types):
+            self._grow_nodes()
+        node = self.num_nodes
+        self.num_nodes += 1
+        self.node_types[node] = PublicGameTree.NODE_TYPES.index(node_type)
+        self.stages[node] = PublicGameTree.STAGES.index(stage)
+        self.depths[node] = depth
+        self.pots[node] = pot
+        self.parents[node] = parent
+        self.public_cards[node, :len(public_cards)] = [int(card) for card in public_cards]
+        if origin_action in PublicGameTree.ACTIONS:
+            self.origin_actions[node] = PublicGameTree.ACTIONS.index(origin_action)
+        if node_type == "player":
+            if self.num_player_nodes == len(self.player_nodes):
+                self._grow_player_rows()
+            player_row = self.num_player_nodes
+            self.num_player_nodes += 1
+            self.player_rows[node] = player_row
+            self.player_nodes[player_row] = node
+            self.strategies[player_row] = 1 / self.num_actions
+        return node
+    
+    def _grow_nodes(self):
+        capacity = 2 * len(self.node_types)
+        for name in ("node_types", "stages", "depths", "pots", "num_children", "acting_player_evaluations", "other_player_evaluations"):
+            setattr(self, name, PublicGameTree._resize(getattr(self, name), capacity, 0))
+        for name in ("parents", "first_children", "origin_actions", "player_rows", "public_cards"):
+            setattr(self, name, PublicGameTree._resize(getattr(self, name), capacity, -1))
+    
+    def _grow_player_rows(self):
+        capacity = 2 * len(self.player_nodes)
+        for name in ("strategies", "cumulative_regrets", "positive_regrets"):
+            setattr(self, name, PublicGameTree._resize(getattr(self, name), capacity, 0))
+        for name in ("player_nodes", "child_by_action"):
+            setattr(self, name, PublicGameTree._resize(getattr(self, name), capacity, -1))
+            
+    @staticmethod
+    def _resize(array: np.ndarray, capacity: int, fill_value: int) -> np.ndarray:
+        resized = np.full((capacity, *array.shape[1:]), fill_value, dtype=array.dtype)
+        resized[:len(array)] = array
+        return resized
+    
+    def get_node_type(self, node: int) -> str:
+        return PublicGameTree.NODE_TYPES[self.node_types[node]]
+    
+    def get_stage(self, node: int) -> str:
+        return PublicGameTree.STAGES[self.stages[node]]
+    
+    def get_children(self, node: int) -> range:
+        return range(self.first_children[node], self.first_children[node] + self.num_children[node])
+    
+    def get_public_cards(self, node: int) -> list[Card]:
+        return [get_card(int(card)) for card in self.public_cards[node] if card >= 0]
+    
+    def get_strategy_matrix(self, node: int) -> np.ndarray:
+        return self.strategies[self.player_rows[node]]
+    
+    def set_strategy_matrices(self, strategy_matrix: np.ndarray):
+        # NOTE: Same strategy for every player node, e.g. the initial strategy of a resolve
+        self.strategies[:self.num_player_nodes] = strategy_matrix
+        
+    def update_regrets(self):
+        # NOTE: Regret matching for every player node and action at once. For a player node p and the child c after action a:
+        # cumulative regret[p, h, a] += other player evaluation[c, h] - acting player evaluation[p, h]
+        # The strategy is the positive regret normalized over the actions. 
+        # Positive regrets are at least 0.001, since cumulative regrets are often negative.
+        player_rows, actions = np.nonzero(self.child_by_action[:self.num_player_nodes] >= 0)
+        children = self.child_by_action[player_rows, actions]
+        regret_updates = self.other_player_evaluations[children] - self.acting_player_evaluations[self.player_nodes[player_rows]]
+        self.cumulative_regrets[player_rows, :, actions] += regret_updates
+        self.positive_regrets[player_rows, :, actions] = np.maximum(0.001, self.cumulative_regrets[player_rows, :, actions])
+        positive_regret_sums = np.sum(self.positive_regrets[:self.num_player_nodes], axis=2)
+        self.strategies[player_rows, :, actions] = self.positive_regrets[player_rows, :, actions] / positive_regret_sums[player_rows]
+        
+    def add_child_states(self, state: "PlayerState | ChanceState", node: int) -> list[tuple["PlayerState | ChanceState | TerminalState", int]]:
+        # NOTE: Adds the generated children of the state of a node, and returns the child states with their nodes.
+        # The trees are flattened one level at a time, so the object states can be dropped once their children are added.
+        if isinstance(state, ChanceState):
+            # NOTE: Each event holds the player state after the event as its only child
+            child_states = [event.children[0] for event in state.children]
+        elif isinstance(state, PlayerState) and not state.stage == "showdown":
+            child_states = state.children
+        else:
+            return []
+        self.first_children[node] = self.num_nodes
+        self.num_children[node] = len(child_states)
+        children = [(child_state, self.add_state(child_state, node)) for child_state in child_states]
+        if self.get_node_type(node) == "player":
+            for action in state.actions_to_children:
+                child_state = PokerStateManager.get_child_state_by_action(state, action)
+                self.child_by_action[self.player_rows[node], PublicGameTree.ACTIONS.index(action)] = \
+                    self.first_children[node] + state.children.index(child_state)
+        return children
+    
+    def add_state(self, state: "PlayerState | ChanceState | TerminalState", parent: int) -> int:
+        if parent < 0:
+            origin_action = None
+        else:
+            origin_action = state.origin_action if not isinstance(state, ChanceState) else None
+        if isinstance(state, ChanceState):
+            return self.add_node("chance", state.stage, state.depth, state.player_state.pot, state.player_state.public_cards, parent, None)
+        if isinstance(state, TerminalState):
+            return self.add_node("terminal", state.stage, state.depth, state.pot, [], parent, origin_action)
+        node_type = "showdown" if state.stage == "showdown" else "player"
+        return self.add_node(node_type, state.stage, state.depth, state.pot, state.public_cards, parent, origin_action)
+    
+    def freeze_structure(self):
+        # NOTE: Makes the structure arrays read only, so writing through any instance of a template raises instead of 
+        # changing every tree built from it
+        for name in PublicGameTree.STRUCTURE_ARRAYS:
+            getattr(self, name).flags.writeable = False
+    
+    def get_instance(self) -> "PublicGameTree":
+        # NOTE: New tree sharing the node structure of this tree, with its own public cards, evaluations, strategies and regrets.
+        # The structure should be frozen first, so one template can be instantiated for any number of boards.
+        game_tree = copy.copy(self)
+        game_tree.public_cards = self.public_cards[:self.num_nodes].copy()
+        game_tree.acting_player_evaluations = np.zeros((self.num_nodes, self.num_hole_pairs), dtype=np.float32)
+        game_tree.other_player_evaluations = np.zeros((self.num_nodes, self.num_hole_pairs), dtype=np.float32)
+        game_tree.strategies = np.full((self.num_player_nodes, self.num_hole_pairs, self.num_actions), 1 / self.num_actions, dtype=np.float32)
+        game_tree.cumulative_regrets = np.zeros((self.num_player_nodes, self.num_hole_pairs, self.num_actions), dtype=np.float32)
+        game_tree.positive_regrets = np.zeros((self.num_player_nodes, self.num_hole_pairs, self.num_actions), dtype=np.float32)
+        game_tree.unexpanded_states = {}
+        return game_tree
+
+
 # MARK: State manager
 class PokerStateManager:
 
@@ -91,57 +253,148 @@ class PokerStateManager:
         # NOTE: Arbitrary number
         self.max_num_events = 3 
         
+        # NOTE: Flattened betting trees by the public state of the root. The tree shape does not depend on the public cards,
+        # so a template is built once and instantiated with new chance events for every board. Oldest templates are dropped first.
+        self.game_tree_templates: dict[tuple, PublicGameTree] = {}
+        self.max_num_game_tree_templates = 64
+        
     
 # MARK: Tree generation
 
     def generate_root_state(self, acting_player, players, public_cards: list[Card], pot: int, num_raises_left: int, bet_to_call: int, 
-                            stage: str, initial_round_action_history: list[str], initial_depth: int, strategy_matrix: np.ndarray | None = None):
-        return PlayerState(acting_player, players, acting_player, public_cards, pot, num_raises_left, bet_to_call, stage, "root", initial_round_action_history, initial_depth, strategy_matrix)
+                            stage: str, initial_round_action_history: list[str], initial_depth: int):
+        # NOTE: Only reads the public information of the agents. The agents are never stored in or mutated by the tree
+        seats = tuple(range(len(players)))
+        bets = np.array([player.current_bet for player in players])
+        stacks = np.array([player.num_chips for player in players])
+        acting_seat = players.index(acting_player)
+        return PlayerState(acting_seat, seats, acting_seat, bets, stacks, public_cards, pot, num_raises_left, bet_to_call, stage, "root", 
+                           initial_round_action_history, initial_depth)
+    
+    
+    def generate_game_tree(self, root_state: PlayerState, end_stage: str, end_depth: int, num_hole_pairs: int) -> PublicGameTree:
+        # NOTE: Same subtree as generate_subtree_to_given_stage_and_depth, flattened into arrays. 
+        # The betting tree is reused from the templates when possible, and bound to the public cards of the root state.
+        # Every player node starts with the uniform strategy.
+        template_key = self.get_game_tree_template_key(root_state, end_stage, end_depth, num_hole_pairs)
+        template = self.game_tree_templates.get(template_key)
+        if template is None:
+            template = self.generate_flat_game_tree(root_state, end_stage, end_depth, num_hole_pairs)
+            template.freeze_structure()
+            if len(self.game_tree_templates) >= self.max_num_game_tree_templates:
+                del self.game_tree_templates[next(iter(self.game_tree_templates))]
+            self.game_tree_templates[template_key] = template
+        game_tree = template.get_instance()
+        self.deal_game_tree_events(game_tree, root_state.public_cards)
+        return game_tree
+    
+    
+    def generate_flat_game_tree(self, root_state: PlayerState, end_stage: str, end_depth: int, num_hole_pairs: int) -> PublicGameTree:
+        # NOTE: Expands the nodes in breadth first order, one level of object states at a time. 
+        # Object states are dropped as soon as their children are added, so the full object tree never exists at once.
+        game_tree = self.generate_lazy_game_tree(root_state, num_hole_pairs)
+        node = 0
+        while node < game_tree.num_nodes:
+            state = game_tree.unexpanded_states.get(node)
+            if state is not None:
+                if self.can_expand_state(state, end_stage, end_depth):
+                    self.expand_game_tree_node(game_tree, node)
+                else:
+                    del game_tree.unexpanded_states[node]
+            node += 1
+        return game_tree
+    
+    
+    def get_game_tree_template_key(self, root_state: PlayerState, end_stage: str, end_depth: int, num_hole_pairs: int) -> tuple:
+        # NOTE: Everything public that decides the shape of the betting tree, i.e. everything but the public cards
+        return (root_state.stage, root_state.depth, root_state.num_raises_left, root_state.bet_to_call, root_state.pot, 
+                tuple(root_state.round_action_history), root_state.players, root_state.acting_player, root_state.current_state_acting_player,
+                tuple(root_state.bets.tolist()), tuple(root_state.stacks.tolist()), end_stage, end_depth, num_hole_pairs)
+    
+    
+    def deal_game_tree_events(self, game_tree: PublicGameTree, public_cards: list[Card]):
+        # NOTE: Sets the public cards of every node from the root's public cards. Nodes are in breadth first order, 
+        # so parents are set before their children, and the events of a chance node are contiguous and dealt from one deck.
+        chance = PublicGameTree.NODE_TYPES.index("chance")
+        terminal = PublicGameTree.NODE_TYPES.index("terminal")
+        game_tree.public_cards[:] = -1
+        game_tree.public_cards[0, :len(public_cards)] = [int(card) for card in public_cards]
+        card_deck = None
+        for node in range(1, game_tree.num_nodes):
+            if game_tree.node_types[node] == terminal:
+                continue
+            parent = game_tree.parents[node]
+            game_tree.public_cards[node] = game_tree.public_cards[parent]
+            if game_tree.node_types[parent] == chance:
+                if node == game_tree.first_children[parent]:
+                    card_deck = CardDeck(limited=self.use_limited_deck)
+                    card_deck.exclude(game_tree.get_public_cards(parent))
+                    card_deck.shuffle()
+                num_public_cards = np.count_nonzero(game_tree.public_cards[node] >= 0)
+                event = card_deck.deal(3 if game_tree.get_stage(node) == "flop" else 1)
+                game_tree.public_cards[node, num_public_cards:num_public_cards + len(event)] = [int(card) for card in event]
     
     
     def generate_subtree_to_given_stage_and_depth(self, state: PlayerState | TerminalState, end_stage: str, end_depth: int):
-        stage_dict = {"pre-flop": 0,
-                      "flop": 1,
-                      "turn": 2,
-                      "river": 3,
-                      "showdown": 4}
-        
-        if isinstance(state, TerminalState):
-            return
-        
-        if len(state.players) == 1:
-            return
-        
-        if stage_dict[state.stage] >= stage_dict[end_stage] and state.depth >= end_depth:
-            return
-        
-        if stage_dict[state.stage] > stage_dict[end_stage]:
+        if not self.can_expand_state(state, end_stage, end_depth):
             return
         
-        next_state_type = self.determine_next_state_type(state)
+        next_state_type = self.generate_child_states(state)
                 
         if next_state_type == "PLAYER":
-            self.generate_all_child_states(state)
             for child in state.children:
                 self.generate_subtree_to_given_stage_and_depth(child, end_stage, end_depth)
             
         if next_state_type == "CHANCE":
-            chance_state = self.get_chance_state_with_event_children(state)
-            state.children.append(chance_state)
+            chance_state = state.children[0]
             for child in chance_state.children: # Player state is stored in each event/child
                 # NOTE: The second level chance node, i.e. event node, has only one child which is the next player state
                 self.generate_subtree_to_given_stage_and_depth(child.children[0], end_stage, end_depth)
                 
+        return
+    
+    
+    def generate_child_states(self, state: PlayerState) -> str:
+        # NOTE: Generates one level of children of a player state, and returns the type of the next state
+        next_state_type = self.determine_next_state_type(state)
+                
+        if next_state_type == "PLAYER":
+            self.generate_all_child_states(state)
+            
+        if next_state_type == "CHANCE":
+            chance_state = self.get_chance_state_with_event_children(state)
+            state.children.append(chance_state)
+                
         if next_state_type == "SHOWDOWN":
-            showdown_state = PlayerState(state.acting_player, state.players, state.current_state_acting_player, 
+            showdown_state = PlayerState(state.acting_player, state.players, state.current_state_acting_player, state.bets, state.stacks, 
                                          state.public_cards, state.pot, state.num_raises_left, state.bet_to_call, "showdown", 
-                                         "call", state.round_action_history, state.depth+1, state.get_strategy_matrix())
+                                         "call", state.round_action_history, state.depth+1)
             self.get_all_showdown_outcomes(showdown_state)
             state.actions_to_children.append("call") # NOTE: Assuming transition to showdown is preceded by call
             state.children.append(showdown_state)
                 
-        return
+        return next_state_type
+    
     
+    def generate_lazy_game_tree(self, root_state: PlayerState, num_hole_pairs: int) -> PublicGameTree:
+        # NOTE: Game tree with only the root. Children are added by expand_game_tree_node the first time a traversal reaches a node,
+        # so branches that are cut by the end stage and depth, or never reached, are never generated.
+        game_tree = PublicGameTree(num_hole_pairs)
+        root = game_tree.add_state(root_state, -1)
+        game_tree.unexpanded_states[root] = root_state
+        return game_tree
+    
+    
+    def expand_game_tree_node(self, game_tree: PublicGameTree, node: int):
+        state = game_tree.unexpanded_states.pop(node)
+        if isinstance(state, PlayerState) and len(state.players) > 1 and not state.stage == "showdown":
+            self.generate_child_states(state)
+        for child_state, child in game_tree.add_child_states(state, node):
+            if not isinstance(child_state, TerminalState):
+                game_tree.unexpanded_states[child] = child_state
+        # NOTE: The children are now nodes, so the state should not keep the object subtree below it alive
+        state.children = []
+
     
         # NOTE: Only considers PLAYER STATES
     def generate_all_child_states(self, state: PlayerState):
@@ -164,13 +417,13 @@ class PokerStateManager:
         if action == "raise":
             players = state.players
             player = state.current_state_acting_player
-            current_bet = state.bet_to_call
-            bet_amount, action, num_raises_left, players = PokerStateManager.handle_raise(player, state.num_raises_left, current_bet, self.num_chips_bet, players,)
+            bet_amount, action, num_raises_left, bets, stacks = PokerStateManager.get_public_raise(player, state.num_raises_left, state.bet_to_call, 
+                                                                                                  self.num_chips_bet, state.bets, state.stacks)
             # If action is set to something else than raise, then the code will continue to the next apropriate "first level" if statement
             if action == "raise":
                 action_to_generated_state = action
                 pot = state.pot + bet_amount
-                bet_to_call = player.current_bet + bet_amount
+                bet_to_call = bets[player]
                 next_index = (players.index(player) + 1) % len(players)
                 next_player = players[next_index]
                 if self.begin_new_round(players, state.round_action_history):
@@ -179,14 +432,13 @@ class PokerStateManager:
                 else:
                     updated_round_history = [*state.round_action_history, action]
                 new_depth = state.depth + 1
-                child_state = PlayerState(state.acting_player, players, next_player, state.public_cards, pot, num_raises_left, bet_to_call, state.stage, action_to_generated_state, updated_round_history, new_depth, state.get_strategy_matrix())
+                child_state = PlayerState(state.acting_player, players, next_player, bets, stacks, state.public_cards, pot, num_raises_left, bet_to_call, state.stage, action_to_generated_state, updated_round_history, new_depth)
         if self.already_generated_state(state, action):
             return None, None
         if action == "call": 
             player = state.current_state_acting_player
             players = state.players
-            current_bet = state.bet_to_call
-            bet_amount, action, players = PokerStateManager.handle_call(player, current_bet, players)
+            bet_amount, action, bets, stacks = PokerStateManager.get_public_call(player, state.bet_to_call, state.bets, state.stacks)
             if action == "call":
                 action_to_generated_state = action
                 pot = state.pot + bet_amount
@@ -198,53 +450,32 @@ class PokerStateManager:
                 else:
                     updated_round_history = [*state.round_action_history, action]
                 new_depth = state.depth + 1
-                child_state = PlayerState(state.acting_player, players, next_player, state.public_cards, pot, state.num_raises_left, state.bet_to_call, state.stage, action_to_generated_state, updated_round_history, new_depth, state.get_strategy_matrix())
+                child_state = PlayerState(state.acting_player, players, next_player, bets, stacks, state.public_cards, pot, state.num_raises_left, state.bet_to_call, state.stage, action_to_generated_state, updated_round_history, new_depth)
         if self.already_generated_state(state, action):
             return None, None
         if action == "fold": 
             # Fold always result in terminal state
-            state_copy = copy.deepcopy(state)
-            player = state_copy.current_state_acting_player
-            players = state_copy.players.copy()
-            next_index = (players.index(player) + 1) % len(players)
-            next_player = players[next_index]
-            action_to_generated_state, players = PokerStateManager.handle_fold(player, players)
-            if player == state.acting_player:
-                if self.begin_new_round(players, state_copy.round_action_history):
-                    # print("NEW ROUND", state.round_action_history)
-                    updated_round_history = [action]
-                else:
-                    updated_round_history = [*state_copy.round_action_history, action]
-                new_depth = state.depth + 1
-                # print("HERE !!!")
-                # child_state = TerminalState(player, players, state_copy.pot, action_to_generated_state, state.depth+1, state.stage)
-                child_state = PlayerState(state_copy.acting_player, players, next_player, state_copy.public_cards, state_copy.pot, state_copy.num_raises_left, state_copy.bet_to_call, state_copy.stage, action_to_generated_state, updated_round_history, new_depth, state.get_strategy_matrix())
+            player = state.current_state_acting_player
+            next_index = (state.players.index(player) + 1) % len(state.players)
+            next_player = state.players[next_index]
+            action_to_generated_state = "fold"
+            players = tuple(seat for seat in state.players if not seat == player)
+            if self.begin_new_round(players, state.round_action_history):
+                updated_round_history = [action]
             else:
-                if self.begin_new_round(players, state_copy.round_action_history):
-                    # print("NEW ROUND", state.round_action_history)
-                    updated_round_history = [action]
-                else:
-                    updated_round_history = [*state_copy.round_action_history, action]
-                new_depth = state.depth + 1
-                if len(players) == 1: # Acting player has won
-                    # print("HEEEEEEERE")
-                    # child_state = TerminalState(player, players, state_copy.pot, action_to_generated_state, state.depth+1, state.stage)
-                    child_state = PlayerState(state_copy.acting_player, players, next_player, state_copy.public_cards, state_copy.pot, state_copy.num_raises_left, state_copy.bet_to_call, state_copy.stage, action_to_generated_state, updated_round_history, new_depth, state.get_strategy_matrix())
-                else:
-                    print("HERE") #NOTE: Never gets here with two players
-                    child_state = PlayerState(state_copy.acting_player, players, next_player, state_copy.public_cards, state_copy.pot, state_copy.num_raises_left, state_copy.bet_to_call, state_copy.stage, action_to_generated_state, updated_round_history, new_depth, state.get_strategy_matrix())
+                updated_round_history = [*state.round_action_history, action]
+            new_depth = state.depth + 1
+            if not player == state.acting_player and len(players) > 1:
+                print("HERE") #NOTE: Never gets here with two players
+            child_state = PlayerState(state.acting_player, players, next_player, state.bets, state.stacks, state.public_cards, state.pot, state.num_raises_left, state.bet_to_call, state.stage, action_to_generated_state, updated_round_history, new_depth)
         return child_state, action_to_generated_state
     
     
     def get_chance_state_with_event_children(self, state: PlayerState) -> ChanceState:
-        cards_to_exclude = []
-        for player in state.players:
-            if state.public_cards == []:
-                cards_to_exclude = [*player.hole_cards]
-            else:
-                cards_to_exclude = [*cards_to_exclude, *player.hole_cards]
+        # NOTE: Only the public cards are excluded, since the tree is shared by every private holding. 
+        # Events that collide with a hole pair are handled by the ranges of the resolver
         card_deck = CardDeck(limited=self.use_limited_deck)
-        card_deck.exclude(cards_to_exclude)
+        card_deck.exclude(state.public_cards)
         card_deck.shuffle()
         
         next_stage = PokerStateManager.get_next_stage(state.stage)
@@ -254,18 +485,15 @@ class PokerStateManager:
         num_public_cards_to_draw = 3 if next_stage == "flop" else 1
         
         for _ in range(self.max_num_events):
-            event_card_deck = copy.deepcopy(card_deck)
-            new_public_cards = event_card_deck.deal(num_public_cards_to_draw)
-            card_deck.exclude(new_public_cards)
-        
-            event_state: PlayerState = copy.deepcopy(state)
-            # NOTE: Depth refers to the depth WITHIN a stage. Since a chance node initiates a new stage, the depth should be set to 0.
-            event_state.depth = 1
-            event_state.round_action_history = []
+            # NOTE: Dealing removes the cards from the shared deck, so the events never draw the same cards
+            new_public_cards = card_deck.deal(num_public_cards_to_draw)
+            event_card_deck = card_deck.copy()
+        
+            # NOTE: The event state only stores what changes with the new stage. Seats, bets, stacks, pot and strategy are shared with the state.
+            # Depth refers to the depth WITHIN a stage. Since a chance node initiates a new stage, the depth should be set to 0.
             event_public_cards = [*state.public_cards, *new_public_cards]
-            event_state.stage = next_stage
-            event_state.public_cards = event_public_cards
-            event_state.num_raises_left = self.legal_num_raises_per_stage
+            event_state = PlayerState(state.acting_player, state.players, state.current_state_acting_player, state.bets, state.stacks, event_public_cards, state.pot, 
+                                      self.legal_num_raises_per_stage, state.bet_to_call, next_stage, state.origin_action, [], 1)
             
             chance_event = ChanceState(event_card_deck, next_stage, self.max_num_events, event_state, new_public_cards)
             chance_event.children.append(event_state)  
@@ -277,9 +505,8 @@ class PokerStateManager:
     
     
     def get_all_showdown_outcomes(self, state: PlayerState):
-        showdown_state = copy.deepcopy(state)
-        showdown_state.origin_action = "showdown"
-        showdown_state.stage = "showdown"
+        showdown_state = PlayerState(state.acting_player, state.players, state.current_state_acting_player, state.bets, state.stacks, state.public_cards, state.pot, 
+                                     state.num_raises_left, state.bet_to_call, "showdown", "showdown", state.round_action_history, state.depth)
         state.children.append(showdown_state)
         for player in showdown_state.players:
             result_state = TerminalState(showdown_state.acting_player, showdown_state.players, showdown_state.pot, "showdown", showdown_state.depth+1, stage="showdown", winner=player)
@@ -290,6 +517,32 @@ class PokerStateManager:
 
 # MARK: Helper methods
 
+    def can_expand_state(self, state: PlayerState | ChanceState | TerminalState, end_stage: str, end_depth: int) -> bool:
+        # NOTE: Whether the children of a state belong to the subtree that ends at the given stage and depth
+        stage_dict = {"pre-flop": 0,
+                      "flop": 1,
+                      "turn": 2,
+                      "river": 3,
+                      "showdown": 4}
+        
+        if isinstance(state, ChanceState):
+            return True
+        
+        if isinstance(state, TerminalState):
+            return False
+        
+        if len(state.players) == 1 or state.stage == "showdown":
+            return False
+        
+        if stage_dict[state.stage] >= stage_dict[end_stage] and state.depth >= end_depth:
+            return False
+        
+        if stage_dict[state.stage] > stage_dict[end_stage]:
+            return False
+        
+        return True
+
+
     def begin_new_round(self, players, round_history: list[str]) -> bool:
         return len(players) == len(round_history)
        
@@ -388,6 +641,36 @@ class PokerStateManager:
         return  bet_amount, action, num_remaining_raises, current_hand_players
 
     
+    @staticmethod
+    def get_public_bet(seat: int, num_chips: int, bets: np.ndarray, stacks: np.ndarray) -> tuple[int, np.ndarray, np.ndarray]:
+        # NOTE: Same as PokerAgent.bet, but returns new bets and stacks so the arrays can be shared between states
+        bet_amount = min(num_chips, stacks[seat])
+        bets = bets.copy()
+        stacks = stacks.copy()
+        bets[seat] += bet_amount
+        stacks[seat] -= bet_amount
+        return bet_amount, bets, stacks
+    
+    @staticmethod
+    def get_public_call(seat: int, current_bet: int, bets: np.ndarray, stacks: np.ndarray) -> tuple[int, str, np.ndarray, np.ndarray]:
+        # NOTE: Public state version of handle_call
+        call_amount = current_bet - bets[seat]
+        if call_amount > stacks[seat]:
+            return 0, "fold", bets, stacks
+        bet_amount, bets, stacks = PokerStateManager.get_public_bet(seat, call_amount, bets, stacks)
+        return bet_amount, "call", bets, stacks
+    
+    @staticmethod
+    def get_public_raise(seat: int, num_remaining_raises: int, current_bet: int, big_blind_chips: int, 
+                         bets: np.ndarray, stacks: np.ndarray) -> tuple[int, str, int, np.ndarray, np.ndarray]:
+        # NOTE: Public state version of handle_raise
+        raise_amount = big_blind_chips + (current_bet - bets[seat])
+        if raise_amount > stacks[seat] or num_remaining_raises == 0:
+            bet_amount, action, bets, stacks = PokerStateManager.get_public_call(seat, current_bet, bets, stacks)
+            return bet_amount, action, num_remaining_raises, bets, stacks
+        bet_amount, bets, stacks = PokerStateManager.get_public_bet(seat, raise_amount, bets, stacks)
+        return bet_amount, "raise", num_remaining_raises - 1, bets, stacks
+
     @staticmethod 
     def iterative_print_subtree(state: PlayerState):
         nodes = state.children
@@ -1,6 +1,9 @@
 from poker_oracle import PokerOracle
 from card_deck import Card
 
+import numpy as np
+import tempfile
+
 use_limited = True
 
 poker_oracle = PokerOracle(use_limited)
@@ -8,7 +11,9 @@ poker_oracle = PokerOracle(use_limited)
 max_num_opponents = 4 
 num_rollouts = 10
 
-cheat_sheet = poker_oracle.generate_and_save_cheat_sheet(max_num_opponents, num_rollouts)
+# NOTE: Written to a temporary directory, so the cheat sheets used by the agents are left as they are
+cheat_sheet_directory = tempfile.TemporaryDirectory()
+cheat_sheet = poker_oracle.generate_and_save_cheat_sheet(max_num_opponents, num_rollouts, directory=cheat_sheet_directory.name)
 
 [print(row) for row in cheat_sheet]
 
@@ -26,4 +31,13 @@ hole_pair2 = [
 
 print(poker_oracle.get_cheat_sheet_hole_pair_probabilitiy(hole_pair1, 1, cheat_sheet))
 print(poker_oracle.get_cheat_sheet_hole_pair_probabilitiy(hole_pair2, 2, cheat_sheet))
-print(poker_oracle.get_cheat_sheet_hole_pair_probabilitiy(hole_pair2, 3, cheat_sheet))
\ No newline at end of file
+print(poker_oracle.get_cheat_sheet_hole_pair_probabilitiy(hole_pair2, 3, cheat_sheet))
+
+loaded_cheat_sheet = PokerOracle(use_limited).load_cheat_sheet(max_num_opponents, num_rollouts, directory=cheat_sheet_directory.name)
+print("Loaded cheat sheet equals generated:", np.array_equal(loaded_cheat_sheet, cheat_sheet), "Target:", True)
+cheat_sheet_directory.cleanup()
+
+# NOTE: An explicit directory without a cheat sheet does not fall back to the tracked CSV cheat sheets
+empty_cheat_sheet_directory = tempfile.TemporaryDirectory()
+print("Cheat sheet from empty directory:", PokerOracle(use_limited).load_cheat_sheet(max_num_opponents, num_rollouts, directory=empty_cheat_sheet_directory.name), "Target:", None)
+empty_cheat_sheet_directory.cleanup()
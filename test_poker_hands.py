@@ -1,5 +1,8 @@
 from card_deck import Card
 from poker_oracle import PokerOracle
+from game_manager import PokerGameManager
+
+import numpy as np
 
 # MARK: Hand classification
 
@@ -207,6 +210,102 @@ print("Evaluation, different hand ranking, 3 public cards", po.evaluate_showdown
 print()
 
 
+# MARK: Multiway showdown
+
+# Two broadway straights tie and beat three aces
+public_cards = [
+    Card('S', 14),
+    Card('D', 13),
+    Card('C', 12),
+    Card('H', 7),
+    Card('S', 2)
+]
+multiway_hole_pairs = [
+    [Card('H', 11), Card('H', 10)],
+    [Card('C', 11), Card('C', 10)],
+    [Card('H', 14), Card('D', 14)]
+]
+winner_indices, pot_shares = po.evaluate_multiway(public_cards, multiway_hole_pairs)
+print("Multiway winners:", winner_indices, "Target:", [0, 1])
+print("Multiway pot shares:", pot_shares.tolist(), "Target:", [0.5, 0.5, 0.0])
+
+# Only the tied winners split the pot
+game_manager = PokerGameManager()
+for name in ["Bob", "Alice", "Chris"]:
+    game_manager.add_poker_agent("rollout", 100, name)
+game_manager.pot = 30
+game_manager.pay_pot([game_manager.poker_agents[i] for i in winner_indices])
+print("Chips after split pot:", [player.num_chips for player in game_manager.poker_agents], "Target:", [115, 115, 100])
+print()
+
+
+# MARK: Hand strength
+
+# Same pair, decided by the second kicker
+public_cards = [
+    Card('D', 13),
+    Card('S', 13),
+    Card('C', 9),
+    Card('C', 5),
+    Card('H', 2)
+]
+
+p1_hole_cards = [
+    Card('S', 14),
+    Card('H', 8)
+]
+
+p2_hole_cards = [
+    Card('H', 14),
+    Card('D', 7)
+]
+
+# P1 should win
+print("Evaluation, same pair and highest card:", po.evaluate_showdown(public_cards, p1_hole_cards, p2_hole_cards), "Target:", 1)
+
+# Same five best cards on the board
+p1_hole_cards = [
+    Card('S', 3),
+    Card('H', 4)
+]
+
+p2_hole_cards = [
+    Card('H', 3),
+    Card('D', 4)
+]
+
+print("Evaluation, board plays:", po.evaluate_showdown([*public_cards[:-1], Card('S', 12)], p1_hole_cards, p2_hole_cards), "Target:", 0)
+
+#==== WHEEL ====
+wheel = [
+    Card('D',14),
+    Card('S',2),
+    Card('C',3),
+    Card('H',4),
+    Card('D',5)
+]
+
+print(po.hand_classifier(wheel)[0], "straight")
+print("Wheel loses to six high straight:", po.evaluate_hand(wheel) < po.evaluate_hand([*wheel[1:], Card('S', 6)]), "Target:", True)
+print()
+
+
+# MARK: Batch evaluation
+
+hands = [
+    royal_flush,
+    four_of_a_kind_1,
+    [*two_pair_1, Card('H', 13), Card('D', 13)],
+    [*pair_1, Card('S', 2), Card('S', 9)],
+]
+
+batch_strengths = po.evaluate_batch(np.asarray([[card.id for card in hand] for hand in hands[:2]]))
+print("Batch evaluation, 5 cards:", list(batch_strengths) == [po.evaluate_hand(hand) for hand in hands[:2]], "Target:", True)
+batch_strengths = po.evaluate_batch(np.asarray([[card.id for card in hand] for hand in hands[2:]]))
+print("Batch evaluation, 7 cards:", list(batch_strengths) == [po.evaluate_hand(hand) for hand in hands[2:]], "Target:", True)
+print()
+
+
 # MARK: Rollout evaluation
 
 # Test rollout evaluation
@@ -240,3 +339,8 @@ print("Rollout hole pair evaluator:", po.rollout_hole_pair_evaluator(hole_pair,
 #     print(key, cheat_sheet[key])
     
 # print(po.get_cheat_sheet_hole_pair_probabilitiy(hole_pair, 2, cheat_sheet))
+print("Rollout hole pair evaluator (loop):", po.rollout_hole_pair_evaluator(hole_pair, public_cards, num_opponents, num_rollouts, mode="loop"))
+print("Exact hole pair evaluator:", po.rollout_hole_pair_evaluator(hole_pair, public_cards, 1, num_rollouts, mode="exact"))
+# NOTE: Without thresholds, the adaptive evaluator only stops early when the interval is narrow enough
+print("Adaptive hole pair evaluator (probability, rollouts used):", po.adaptive_hole_pair_evaluator(hole_pair, None, 1, 1000))
+print("Equity against a uniform range:", po.get_range_equity(hole_pair, public_cards, np.ones(po.num_hole_pairs)))
@@ -5,6 +5,7 @@ from resolver import Resolver
 from card_deck import CardDeck
 from neural_networks import NeuralNetwork
 
+import numpy as np
 import time
 
 use_limited_deck = True
@@ -29,7 +30,6 @@ for player in game_manager.poker_agents:
 
 acting_player = game_manager.poker_agents[0]
 
-initital_strategy = resolver.get_initial_strategy()
 initital_acting_ranges, initial_other_ranges = resolver.get_initial_ranges([], acting_player.hole_cards)
 
 
@@ -43,8 +43,7 @@ pre_flop_state = state_manager.generate_root_state(acting_player=game_manager.po
                                             bet_to_call=game_manager.current_bet,
                                             stage="pre-flop",
                                             initial_round_action_history=[],
-                                            initial_depth=0,
-                                            strategy_matrix=initital_strategy
+                                            initial_depth=0
                                             )
 end_stage = "flop"
 end_depth = 1
@@ -67,8 +66,7 @@ flop_state = state_manager.generate_root_state(acting_player=game_manager.poker_
                                             bet_to_call=game_manager.current_bet,
                                             stage="flop",
                                             initial_round_action_history=[],
-                                            initial_depth=0,
-                                            strategy_matrix=initital_strategy
+                                            initial_depth=0
                                             )
 end_stage = "turn"
 end_depth = 1
@@ -90,8 +88,7 @@ turn_state = state_manager.generate_root_state(acting_player=game_manager.poker_
                                             bet_to_call=game_manager.current_bet,
                                             stage="turn",
                                             initial_round_action_history=[],
-                                            initial_depth=0,
-                                            strategy_matrix=initital_strategy
+                                            initial_depth=0
                                             )
 end_stage = "river"
 end_depth = 1
@@ -113,8 +110,7 @@ river_state = state_manager.generate_root_state(acting_player=game_manager.poker
                                             bet_to_call=game_manager.current_bet,
                                             stage="river",
                                             initial_round_action_history=[],
-                                            initial_depth=0,
-                                            strategy_matrix=initital_strategy
+                                            initial_depth=0
                                             )
 end_stage = "showdown"
 end_depth = 1
@@ -124,3 +120,23 @@ print(river_strategy)
 # NOTE: 351 seconds (almost 6 minutes) with 10 rollouts, 26 - 33 seconds with 1 rollout
 print(f"Finished resolving form river to showdown in {time.time() - start_time:.3f} seconds.")
 print()
+
+
+# MARK: Lazy tree expansion
+start_time = time.time()
+lazy_resolver = Resolver(state_manager, poker_oracle, lazy_tree_expansion=True)
+lazy_river_state = state_manager.generate_root_state(acting_player=game_manager.poker_agents[0], 
+                                            players=game_manager.poker_agents, 
+                                            public_cards=public_cards, 
+                                            pot=0, 
+                                            num_raises_left=game_manager.legal_num_raises_per_stage, 
+                                            bet_to_call=game_manager.current_bet,
+                                            stage="river",
+                                            initial_round_action_history=[],
+                                            initial_depth=0
+                                            )
+lazy_river_strategy = lazy_resolver.resolve(lazy_river_state, initital_acting_ranges, initial_other_ranges, end_stage, end_depth, num_rollouts)
+# NOTE: No chance events on the river, so the lazily expanded tree gives the same strategy
+print("Same strategy as the full tree:", np.allclose(lazy_river_strategy, river_strategy), "Target:", True)
+print(f"Finished lazy resolving form river to showdown in {time.time() - start_time:.3f} seconds.")
+print()
@@ -1,5 +1,6 @@
 from game_manager import PokerGameManager
 from state_manager import PokerStateManager
+from poker_oracle import PokerOracle
 from card_deck import CardDeck
 
 game_manager = PokerGameManager()
@@ -101,4 +102,48 @@ PokerStateManager.iterative_print_subtree(turn_state)
 print()
 print("River -> Showdown")
 PokerStateManager.iterative_print_subtree(river_state)
-print()
\ No newline at end of file
+print()
+
+
+# MARK: Game tree
+# NOTE: The same subtree flattened into arrays, as used by the resolver
+poker_oracle = PokerOracle(game_manager.use_limited_deck)
+river_game_tree = state_manager.generate_game_tree(state_manager.generate_root_state(acting_player=game_manager.poker_agents[0], 
+                                                                                   players=game_manager.poker_agents, 
+                                                                                   public_cards=public_cards, 
+                                                                                   pot=0, 
+                                                                                   num_raises_left=game_manager.legal_num_raises_per_stage, 
+                                                                                   bet_to_call=game_manager.current_bet,
+                                                                                   stage="river",
+                                                                                   initial_round_action_history=[],
+                                                                                   initial_depth=0
+                                                                                   ), 
+                                                   end_stage="showdown", 
+                                                   end_depth=1, 
+                                                   num_hole_pairs=poker_oracle.num_hole_pairs)
+print("River -> Showdown game tree:", len(river_game_tree), "nodes,", river_game_tree.num_player_nodes, "player nodes")
+
+# NOTE: A new board with the same betting state reuses the template of the tree above
+other_public_cards = CardDeck(game_manager.use_limited_deck).deal(5)
+other_river_game_tree = state_manager.generate_game_tree(state_manager.generate_root_state(acting_player=game_manager.poker_agents[0], 
+                                                                                         players=game_manager.poker_agents, 
+                                                                                         public_cards=other_public_cards, 
+                                                                                         pot=0, 
+                                                                                         num_raises_left=game_manager.legal_num_raises_per_stage, 
+                                                                                         bet_to_call=game_manager.current_bet,
+                                                                                         stage="river",
+                                                                                         initial_round_action_history=[],
+                                                                                         initial_depth=0
+                                                                                         ), 
+                                                         end_stage="showdown", 
+                                                         end_depth=1, 
+                                                         num_hole_pairs=poker_oracle.num_hole_pairs)
+print("Game tree templates:", len(state_manager.game_tree_templates), "Target:", 1)
+print("Board of new tree:", *other_river_game_tree.get_public_cards(0), "Target:", *other_public_cards)
+
+# NOTE: The structure of a template is shared by all its instances, so writing through an instance should fail
+try:
+    other_river_game_tree.first_children[0] = 0
+    print("Writing to template structure raised: False Target: True")
+except ValueError:
+    print("Writing to template structure raised: True Target: True")
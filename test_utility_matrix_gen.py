@@ -18,21 +18,21 @@ public_cards = [
 start_time = time.time()
 utility_matrix_limited, hole_pair_keys_limited = poker_oracle_limited.utility_matrix_generator(public_cards[:-2])
 print(utility_matrix_limited) 
-# NOTE: Around 0.5 - 1 second
+# NOTE: Around 0.5 - 1 second before scoring each hole pair once. Now a few milliseconds
 print(f"Generated utility matrix using 3 public cards and limited deck in {time.time() - start_time:.3f} seconds.")
 print()
 
 start_time = time.time()
 utility_matrix_limited, hole_pair_keys_limited = poker_oracle_limited.utility_matrix_generator(public_cards[:-1])
 print(utility_matrix_limited) 
-# NOTE: Around 2 - 3 seconds
+# NOTE: Around 2 - 3 seconds before scoring each hole pair once. Now a few milliseconds
 print(f"Generated utility matrix using 4 public cards and limited deck in {time.time() - start_time:.3f} seconds.")
 print()
 
 start_time = time.time()
 utility_matrix_limited, hole_pair_keys_limited = poker_oracle_limited.utility_matrix_generator(public_cards)
 print(utility_matrix_limited) 
-# NOTE: Around 9 - 10 seconds
+# NOTE: Around 9 - 10 seconds before scoring each hole pair once. Now a few milliseconds
 print(f"Generated utility matrix using 5 public cards and limited deck in {time.time() - start_time:.3f} seconds.")
 print()
 print("Number of hole pairs:", len(hole_pair_keys_limited))
@@ -42,23 +42,32 @@ print()
 start_time = time.time()
 utility_matrix, hole_pair_keys = poker_oracle.utility_matrix_generator(public_cards[:-2])
 print(utility_matrix) 
-# NOTE: Around 21 seconds
+# NOTE: Around 21 seconds before scoring each hole pair once. Now around 0.02 - 0.06 seconds
 print(f"Generated utility matrix using 3 public cards and limited deck in {time.time() - start_time:.3f} seconds.")
 print()
 
 start_time = time.time()
 utility_matrix, hole_pair_keys = poker_oracle.utility_matrix_generator(public_cards[:-1])
 print(utility_matrix) 
-# NOTE: Around 93 seconds
+# NOTE: Around 93 seconds before scoring each hole pair once. Now around 0.02 seconds
 print(f"Generated utility matrix using 4 public cards and limited deck in {time.time() - start_time:.3f} seconds.")
 print()
 
 start_time = time.time()
 utility_matrix, hole_pair_keys = poker_oracle.utility_matrix_generator(public_cards)
 print(utility_matrix) 
-# NOTE: Around 283 seconds
+# NOTE: Around 283 seconds before scoring each hole pair once. Now around 0.02 seconds
 print(f"Generated utility matrix using 5 public cards and limited deck in {time.time() - start_time:.3f} seconds.")
 print()
 print("Number of hole pairs:", len(hole_pair_keys_limited))
 print()
 
+
+# MARK: Cached utility matrices
+# NOTE: Matrices from get_utility_matrix are read only for every board, and caching does not change the caller's matrix
+suit_swapped_public_cards = [Card('H', 11), Card('C', 12), Card('S', 13)]
+for board in (public_cards[:-2], suit_swapped_public_cards):
+    print("Utility matrix writeable:", poker_oracle_limited.get_utility_matrix(board).flags.writeable, "Target:", False)
+generated_utility_matrix, _ = poker_oracle_limited.utility_matrix_generator(public_cards[:-1])
+poker_oracle_limited.utility_matrix_cache.put(poker_oracle_limited.get_board_key(public_cards[:-1]), generated_utility_matrix)
+print("Generated matrix writeable after caching:", generated_utility_matrix.flags.writeable, "Target:", True)